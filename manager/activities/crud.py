@@ -1,71 +1,112 @@
 from fastapi import status
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy import select
+from sqlalchemy import delete, literal, select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from activities.tree import ActivityTreeSnapshot, activity_tree_cache
+from core.cache_versions import ACTIVITY_TREE_CACHE, TILES_CACHE, bump_cache_versions, cache_versions
 from core.crud_foundation import CRUDBase
 from core.logger import logger
-from core.models import Activity, activity_hierarchy
+from core.models import Activity, Organization, activity_closure, activity_hierarchy, organization_activity
 from core.utils import log_and_raise_error
+from organizations.outbox import enqueue_organizations_sync_where
 
 
 class ActivityCRUD(CRUDBase):
 
+    async def get_activity_tree_snapshot(self, session: AsyncSession) -> ActivityTreeSnapshot:
+        """Получение актуального снимка дерева видов деятельности, при отсутствии снимок строится одним запросом."""
+
+        async def load_rows():
+            result = await session.execute(
+                select(
+                    Activity.id,
+                    Activity.name,
+                    Activity.level,
+                    activity_hierarchy.c.parent_id,
+                    Activity.create_date,
+                    Activity.update_date,
+                )
+                .outerjoin(activity_hierarchy, activity_hierarchy.c.child_id == Activity.id)
+                .order_by(Activity.id)
+            )
+            logger.debug("Снимок дерева видов деятельности загружен из БД.")
+            return result.tuples().all()
+
+        # Версия читается до строк дерева: уведомление о записи, пришедшее во время загрузки, увеличит версию,
+        # и следующее чтение перестроит снимок. Обращения к БД нет, пока снимок текущей версии в кэше.
+        version = cache_versions.version(ACTIVITY_TREE_CACHE)
+        return await activity_tree_cache.get_snapshot(version, load_rows)
+
     async def get_activity_tree_with_children(self, session: AsyncSession, max_level: int = 3):
         """Получение дерева видов деятельности начиная от объектов с level==1."""
-        result = await session.execute(
-            select(Activity.id, Activity.name, Activity.level)
-            .filter(Activity.level == 1)
-        )
-        root_activity_ids = [row[0] for row in result.fetchall()]
-
-        if not root_activity_ids:
-            return []
+        snapshot = await self.get_activity_tree_snapshot(session)
+        return snapshot.render(max_level=max_level)
 
-        cte = select(activity_hierarchy.c.child_id).filter(
-            activity_hierarchy.c.parent_id.in_(root_activity_ids)
-        ).cte(name="activity_tree", recursive=True)
+    async def get_from_tree(self, obj_id: int, session: AsyncSession):
+        """Получение вида деятельности из снимка дерева без обращения к БД."""
+        snapshot = await self.get_activity_tree_snapshot(session)
+        return snapshot.get(obj_id)
 
-        recursive_cte = cte.union_all(
-            select(activity_hierarchy.c.child_id)
-            .join(cte, activity_hierarchy.c.parent_id == cte.c.child_id)
+    @staticmethod
+    async def add_closure_paths(activity_id: int, parent_id: int | None, session: AsyncSession):
+        """Регистрация в таблице замыкания пути к самому себе и путей от всех предков родителя."""
+        await session.execute(
+            activity_closure.insert().values(ancestor_id=activity_id, descendant_id=activity_id, depth=0)
         )
+        if parent_id:
+            await session.execute(
+                activity_closure.insert().from_select(
+                    ["ancestor_id", "descendant_id", "depth"],
+                    select(
+                        activity_closure.c.ancestor_id,
+                        literal(activity_id),
+                        activity_closure.c.depth + 1,
+                    ).where(activity_closure.c.descendant_id == parent_id),
+                )
+            )
+        logger.debug(f"В таблице замыкания зарегистрированы пути для вида деятельности с id {activity_id}.")
 
-        result = await session.execute(
-            select(Activity)
-            .join(recursive_cte, Activity.id == recursive_cte.c.child_id)
-            .filter(Activity.level <= max_level)  # Ограничиваем уровни
+    @staticmethod
+    async def move_closure_subtree(activity_id: int, parent_id: int, session: AsyncSession):
+        """Перенос поддерева вида деятельности под нового родителя в таблице замыкания."""
+        subtree_ids = select(activity_closure.c.descendant_id).where(
+            activity_closure.c.ancestor_id == activity_id
         )
-        activities = result.scalars().all()
-
-        result_level_1 = await session.execute(
-            select(Activity).filter(Activity.level == 1)
+        await session.execute(
+            delete(activity_closure).where(
+                activity_closure.c.descendant_id.in_(subtree_ids),
+                activity_closure.c.ancestor_id.not_in(subtree_ids),
+            )
         )
-        level_1_activities = result_level_1.scalars().all()
-        activities.extend(level_1_activities)
-
-        result_hierarchy = await session.execute(
-            select(activity_hierarchy.c.parent_id, activity_hierarchy.c.child_id)
+        supertree = activity_closure.alias("supertree")
+        subtree = activity_closure.alias("subtree")
+        await session.execute(
+            activity_closure.insert().from_select(
+                ["ancestor_id", "descendant_id", "depth"],
+                select(
+                    supertree.c.ancestor_id,
+                    subtree.c.descendant_id,
+                    supertree.c.depth + subtree.c.depth + 1,
+                ).where(
+                    supertree.c.descendant_id == parent_id,
+                    subtree.c.ancestor_id == activity_id,
+                ),
+            )
         )
-        hierarchy_data = result_hierarchy.fetchall()
-
-        def build_tree(activity, all_activities, hierarchy_data):
-            tree_item = {
-                "id": activity.id,
-                "name": activity.name,
-                "level": activity.level,
-            }
-            children = [
-                child for child in all_activities
-                if (activity.id, child.id) in hierarchy_data
-            ]
-            if children:
-                tree_item["children"] = [build_tree(child, all_activities, hierarchy_data) for child in children]
-            return tree_item
+        logger.debug(f"В таблице замыкания перенесено поддерево вида деятельности с id {activity_id}.")
 
-        tree = [build_tree(activity, activities, hierarchy_data) for activity in activities if activity.id in root_activity_ids]
-        return tree
+    @staticmethod
+    async def enqueue_linked_organizations(activity_id: int, session: AsyncSession):
+        """Постановка в очередь Elastic Search организаций, документы которых содержат вид деятельности."""
+        await enqueue_organizations_sync_where(
+            session,
+            Organization.id.in_(
+                select(organization_activity.c.organization_id)
+                .where(organization_activity.c.activity_id == activity_id)
+            ),
+        )
 
     async def create(self, create_data, session: AsyncSession):
         """Создание вида деятельности."""
@@ -90,8 +131,8 @@ class ActivityCRUD(CRUDBase):
         new_obj = self.model(**create_data)
         try:
             session.add(new_obj)
+            await session.flush()
             if parent_id:
-                await session.flush()
                 await session.execute(
                     activity_hierarchy.insert().values(
                         parent_id=parent_id,
@@ -99,6 +140,8 @@ class ActivityCRUD(CRUDBase):
                     )
                 )
                 logger.debug("В сессии зарегистрирована связь с родительским элементом.")
+            await self.add_closure_paths(activity_id=new_obj.id, parent_id=parent_id, session=session)
+            await bump_cache_versions(session, ACTIVITY_TREE_CACHE)
             await session.commit()
             await session.refresh(new_obj)
             return new_obj
@@ -145,13 +188,28 @@ class ActivityCRUD(CRUDBase):
                 setattr(db_obj, field, update_data[field])
         try:
             session.add(db_obj)
+            if update_data.get("name") is not None:
+                await self.enqueue_linked_organizations(activity_id=db_obj.id, session=session)
             if parent_id:
                 await session.execute(
                     activity_hierarchy.update()
                     .where(activity_hierarchy.c.child_id == db_obj.id)
                     .values(parent_id=parent_id)
                 )
+                await self.move_closure_subtree(activity_id=db_obj.id, parent_id=parent_id, session=session)
+                await enqueue_organizations_sync_where(
+                    session,
+                    Organization.id.in_(
+                        select(organization_activity.c.organization_id)
+                        .join(
+                            activity_closure,
+                            activity_closure.c.descendant_id == organization_activity.c.activity_id,
+                        )
+                        .where(activity_closure.c.ancestor_id == db_obj.id)
+                    ),
+                )
                 logger.debug("В сессии изменена связь с родительским элементом.")
+            await bump_cache_versions(session, ACTIVITY_TREE_CACHE)
             await session.commit()
             await session.refresh(db_obj)
             return db_obj
@@ -166,7 +224,10 @@ class ActivityCRUD(CRUDBase):
     ):
         """Удаление вида деятельности, поведение меняется в зависимости от вложенности."""
         if db_obj.level == 3:
+            await ActivityCRUD.enqueue_linked_organizations(activity_id=db_obj.id, session=session)
             await session.delete(db_obj)
+            # Связи организаций с удалённым видом деятельности удаляются каскадно и попадают в свойства тайлов.
+            await bump_cache_versions(session, ACTIVITY_TREE_CACHE, TILES_CACHE)
             await session.commit()
             logger.debug(f"Объект с id {db_obj.id} удалён из системы.")
             return db_obj
@@ -186,7 +247,9 @@ class ActivityCRUD(CRUDBase):
                     activity_hierarchy.c.child_id == db_obj.id
                 )
             )
+            await ActivityCRUD.enqueue_linked_organizations(activity_id=db_obj.id, session=session)
             await session.delete(db_obj)
+            await bump_cache_versions(session, ACTIVITY_TREE_CACHE, TILES_CACHE)
             await session.commit()
             return db_obj
 
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, Response, status
 from fastapi.params import Depends, Path
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -6,7 +6,8 @@ from activities.crud import activity_crud
 from activities.schemas import ActivityCreate, ActivityUpdate
 from core.authentication_utils import check_token
 from core.db import get_async_session
-from core.utils import Tags, check_exists_and_get_or_return_error
+from core.routing import get_routed_session
+from core.utils import Tags, check_exists_and_get_or_return_error, etag_matches
 
 router = APIRouter(
     prefix="/activities",
@@ -22,7 +23,7 @@ async def get_activity_by_id_for_admin(
     return await check_exists_and_get_or_return_error(
         db_id=activity_id,
         crud=activity_crud,
-        method_name="get",
+        method_name="get_from_tree",
         error="Такого вида деятельности нет в БД!",
         status_code=status.HTTP_404_NOT_FOUND,
         session=session,
@@ -31,10 +32,19 @@ async def get_activity_by_id_for_admin(
 
 @router.get("/get-all")
 async def get_all_activities(
+        request: Request,
+        response: Response,
         session: AsyncSession = Depends(get_async_session),
 ):
     try:
-        return await activity_crud.get_activity_tree_with_children(session=session)
+        snapshot = await activity_crud.get_activity_tree_snapshot(session=session)
+        if etag_matches(request.headers.get("if-none-match"), snapshot.etag):
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                headers={"ETag": snapshot.etag},
+            )
+        response.headers["ETag"] = snapshot.etag
+        return snapshot.render()
     except Exception as e:
         raise HTTPException(
             detail=f"{e}",
@@ -45,7 +55,7 @@ async def get_all_activities(
 @router.post("/create")
 async def create_new_activity(
         activity_data: ActivityCreate,
-        session: AsyncSession = Depends(get_async_session)
+        session: AsyncSession = Depends(get_routed_session)
 ):
     return await activity_crud.create(activity_data, session)
 
@@ -54,7 +64,7 @@ async def create_new_activity(
 async def update_activity(
         activity_data: ActivityUpdate,
         activity_id: int = Path(...),
-        session: AsyncSession = Depends(get_async_session),
+        session: AsyncSession = Depends(get_routed_session),
 ):
     activity = await check_exists_and_get_or_return_error(
         db_id=activity_id,
@@ -72,7 +82,7 @@ async def update_activity(
 @router.delete("/delete-activity-by-id/{activity_id}")
 async def delete_activity_by_id(
         activity_id: int = Path(...),
-        session: AsyncSession = Depends(get_async_session),
+        session: AsyncSession = Depends(get_routed_session),
 ):
     activity = await check_exists_and_get_or_return_error(
         db_id=activity_id,
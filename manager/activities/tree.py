@@ -0,0 +1,147 @@
+import asyncio
+import hashlib
+from collections import defaultdict
+from datetime import datetime
+from typing import Awaitable, Callable, Iterable, Optional
+
+
+def build_activity_tree(
+    rows: Iterable[tuple[int, str, int, Optional[int]]], max_level: int = 3
+) -> list[dict]:
+    """
+    Сборка дерева видов деятельности за один проход по строкам (id, name, level, parent_id).
+    Связи родитель -> потомки складываются в индекс смежности, поэтому сборка выполняется за O(n).
+    """
+    nodes: dict[int, dict] = {}
+    children_index: dict[int, list[int]] = defaultdict(list)
+    root_ids: list[int] = []
+
+    for activity_id, name, level, parent_id in rows:
+        if level > max_level:
+            continue
+        if activity_id not in nodes:
+            nodes[activity_id] = {"id": activity_id, "name": name, "level": level}
+            if level == 1:
+                root_ids.append(activity_id)
+        if parent_id is not None:
+            children_index[parent_id].append(activity_id)
+
+    for parent_id, child_ids in children_index.items():
+        parent = nodes.get(parent_id)
+        if parent is None:
+            continue
+        children = [nodes[child_id] for child_id in child_ids if child_id in nodes]
+        if children:
+            parent["children"] = children
+
+    return [nodes[root_id] for root_id in root_ids]
+
+
+class ActivityNode:
+    """Компактное представление вида деятельности внутри снимка дерева."""
+
+    __slots__ = ("id", "name", "level", "parent_ids", "create_date", "update_date")
+
+    def __init__(
+        self,
+        activity_id: int,
+        name: str,
+        level: int,
+        create_date: datetime,
+        update_date: datetime,
+    ):
+        self.id = activity_id
+        self.name = name
+        self.level = level
+        self.parent_ids: list[int] = []
+        self.create_date = create_date
+        self.update_date = update_date
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "level": self.level,
+            "create_date": self.create_date,
+            "update_date": self.update_date,
+        }
+
+
+class ActivityTreeSnapshot:
+    """
+    Неизменяемый снимок дерева видов деятельности, привязанный к версии кэша.
+    ETag считается по содержимому строк, поэтому совпадает во всех процессах приложения с одинаковыми данными.
+    """
+
+    __slots__ = ("version", "etag", "nodes", "_rendered")
+
+    def __init__(
+        self,
+        version: Optional[int],
+        rows: Iterable[tuple[int, str, int, Optional[int], datetime, datetime]],
+    ):
+        rows = list(rows)
+        self.version = version
+        self.etag = f'"activities-{hashlib.sha1(repr(rows).encode()).hexdigest()}"'
+        self.nodes: dict[int, ActivityNode] = {}
+        self._rendered: dict[int, list[dict]] = {}
+        for activity_id, name, level, parent_id, create_date, update_date in rows:
+            node = self.nodes.get(activity_id)
+            if node is None:
+                node = ActivityNode(activity_id, name, level, create_date, update_date)
+                self.nodes[activity_id] = node
+            if parent_id is not None:
+                node.parent_ids.append(parent_id)
+
+    def get(self, activity_id: int) -> Optional[dict]:
+        node = self.nodes.get(activity_id)
+        return node.as_dict() if node is not None else None
+
+    def render(self, max_level: int = 3) -> list[dict]:
+        """Дерево в формате ответа /activities/get-all, собирается один раз на каждый max_level."""
+        tree = self._rendered.get(max_level)
+        if tree is None:
+            tree = build_activity_tree(
+                (
+                    (node.id, node.name, node.level, parent_id)
+                    for node in self.nodes.values()
+                    for parent_id in (node.parent_ids or [None])
+                ),
+                max_level=max_level,
+            )
+            self._rendered[max_level] = tree
+        return tree
+
+
+class ActivityTreeCache:
+    """
+    Кэш дерева видов деятельности внутри процесса.
+    Снимок привязан к версии из core.cache_versions: после коммита записи в виды деятельности каждый процесс
+    получает уведомление и перестраивает снимок при первом чтении новой версии. Без версии (уведомления
+    не принимаются) снимок строится из БД при каждом чтении и не сохраняется.
+    """
+
+    def __init__(self):
+        self._snapshot: Optional[ActivityTreeSnapshot] = None
+        self._lock = asyncio.Lock()
+
+    async def get_snapshot(
+        self, version: Optional[int], loader: Callable[[], Awaitable[Iterable[tuple]]]
+    ) -> ActivityTreeSnapshot:
+        if version is None:
+            return ActivityTreeSnapshot(None, await loader())
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        async with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.version == version:
+                return snapshot
+            snapshot = ActivityTreeSnapshot(version, await loader())
+            # Запрос, прочитавший версию раньше параллельной записи, не заменяет более новый снимок.
+            if self._snapshot is None or self._snapshot.version < version:
+                self._snapshot = snapshot
+            return snapshot
+
+
+activity_tree_cache = ActivityTreeCache()
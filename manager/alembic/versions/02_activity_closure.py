@@ -0,0 +1,51 @@
+"""activity closure table
+
+Revision ID: 02
+Revises: 01
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '02'
+down_revision: Union[str, None] = '01'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('activity_closure',
+    sa.Column('ancestor_id', sa.Integer(), nullable=False),
+    sa.Column('descendant_id', sa.Integer(), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=False, comment='Расстояние от предка до потомка'),
+    sa.ForeignKeyConstraint(['ancestor_id'], ['activities.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['descendant_id'], ['activities.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+    )
+    op.create_index('ix_activity_closure_descendant_id', 'activity_closure', ['descendant_id'], unique=False)
+    # Заполнение таблицы замыкания по уже существующим связям activity_hierarchy.
+    op.execute(
+        """
+        INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+        WITH RECURSIVE activity_tree AS (
+            SELECT id AS ancestor_id, id AS descendant_id, 0 AS depth
+            FROM activities
+            UNION ALL
+            SELECT activity_tree.ancestor_id, activity_hierarchy.child_id, activity_tree.depth + 1
+            FROM activity_tree
+            JOIN activity_hierarchy ON activity_hierarchy.parent_id = activity_tree.descendant_id
+        )
+        SELECT ancestor_id, descendant_id, min(depth)
+        FROM activity_tree
+        GROUP BY ancestor_id, descendant_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_activity_closure_descendant_id', table_name='activity_closure')
+    op.drop_table('activity_closure')
@@ -0,0 +1,38 @@
+"""elastic outbox
+
+Revision ID: 03
+Revises: 02
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '03'
+down_revision: Union[str, None] = '02'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('elastic_outbox',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('organization_id', sa.Integer(), nullable=False, comment='Организация, изменения которой нужно передать в Elastic Search'),
+    sa.Column('operation', sa.String(length=16), nullable=False, comment='Операция над документом: index или delete'),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('next_attempt_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('processed_at', sa.TIMESTAMP(timezone=True), nullable=True),
+    sa.Column('create_date', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('update_date', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_elastic_outbox_pending', 'elastic_outbox', ['next_attempt_at', 'id'], unique=False, postgresql_where=sa.text('processed_at IS NULL'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_elastic_outbox_pending', table_name='elastic_outbox', postgresql_where=sa.text('processed_at IS NULL'))
+    op.drop_table('elastic_outbox')
@@ -0,0 +1,28 @@
+"""buildings geo_point gist index
+
+Revision ID: 04
+Revises: 03
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '04'
+down_revision: Union[str, None] = '03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # В 01_initial создание индекса закомментировано, а в части окружений его могли создать вручную.
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_buildings_geo_point ON buildings USING gist (geo_point)"
+    )
+
+
+def downgrade() -> None:
+    # Индекс не удаляется: downgrade ревизии 01 сам удаляет idx_buildings_geo_point.
+    pass
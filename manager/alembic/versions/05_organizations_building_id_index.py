@@ -0,0 +1,36 @@
+"""organizations building_id index
+
+Revision ID: 05
+Revises: 04
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '05'
+down_revision: Union[str, None] = '04'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Поиск организаций рядом с точкой идёт от зданий, найденных по GiST индексу, к их организациям.
+    # CONCURRENTLY не блокирует запись в таблицу, но не выполняется внутри транзакции.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f('ix_organizations_building_id'),
+            'organizations',
+            ['building_id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            op.f('ix_organizations_building_id'), table_name='organizations', postgresql_concurrently=True
+        )
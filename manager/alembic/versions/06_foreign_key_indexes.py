@@ -0,0 +1,45 @@
+"""foreign key indexes
+
+Revision ID: 06
+Revises: 05
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '06'
+down_revision: Union[str, None] = '05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # organization_id и parent_id уже ведущие колонки уникальных ограничений, индексы нужны только вторым колонкам.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_organization_activities_activity_id',
+            'organization_activities',
+            ['activity_id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_activity_hierarchy_child_id',
+            'activity_hierarchy',
+            ['child_id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_activity_hierarchy_child_id', table_name='activity_hierarchy', postgresql_concurrently=True)
+        op.drop_index(
+            'ix_organization_activities_activity_id',
+            table_name='organization_activities',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,25 @@
+"""elastic outbox failed_at
+
+Revision ID: 07
+Revises: 06
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '07'
+down_revision: Union[str, None] = '06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('elastic_outbox', sa.Column('failed_at', sa.TIMESTAMP(timezone=True), nullable=True, comment='Время перевода записи в dead-letter после исчерпания попыток'))
+
+
+def downgrade() -> None:
+    op.drop_column('elastic_outbox', 'failed_at')
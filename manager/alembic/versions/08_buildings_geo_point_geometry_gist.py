@@ -0,0 +1,30 @@
+"""buildings geo_point geometry gist index
+
+Revision ID: 08
+Revises: 07
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '08'
+down_revision: Union[str, None] = '07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Выражение совпадает с CAST(geo_point AS Geometry(srid=4326)) в запросах, иначе планировщик не применит индекс.
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_buildings_geo_point_geometry "
+            "ON buildings USING gist ((CAST(geo_point AS geometry(GEOMETRY,4326))))"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_buildings_geo_point_geometry")
@@ -0,0 +1,66 @@
+"""
+Замер времени сборки дерева видов деятельности на синтетических данных.
+
+Запуск: python benchmark_activity_tree.py
+"""
+import random
+import time
+
+from activities.tree import build_activity_tree
+
+SIZES = [100, 300, 1_000, 10_000, 100_000]
+LEGACY_MAX_SIZE = 300
+
+
+def generate_rows(size: int) -> list[tuple[int, str, int, int | None]]:
+    """Генерация трёхуровневого дерева: ~1% корней, ~9% второго уровня, остальное третий уровень."""
+    rows = []
+    level_1_count = max(1, size // 100)
+    level_2_count = max(1, size // 10 - level_1_count)
+    level_1_ids = list(range(1, level_1_count + 1))
+    level_2_ids = list(range(level_1_count + 1, level_1_count + level_2_count + 1))
+
+    for activity_id in level_1_ids:
+        rows.append((activity_id, f"Activity {activity_id}", 1, None))
+    for activity_id in level_2_ids:
+        rows.append((activity_id, f"Activity {activity_id}", 2, random.choice(level_1_ids)))
+    for activity_id in range(level_2_ids[-1] + 1, size + 1):
+        rows.append((activity_id, f"Activity {activity_id}", 3, random.choice(level_2_ids)))
+    return rows
+
+
+def build_tree_legacy(rows: list[tuple[int, str, int, int | None]]) -> list[dict]:
+    """Прежний алгоритм: для каждого узла полный перебор всех видов деятельности и списка связей."""
+    hierarchy_data = [(parent_id, activity_id) for activity_id, _, _, parent_id in rows if parent_id]
+
+    def build_tree(activity):
+        tree_item = {"id": activity[0], "name": activity[1], "level": activity[2]}
+        children = [child for child in rows if (activity[0], child[0]) in hierarchy_data]
+        if children:
+            tree_item["children"] = [build_tree(child) for child in children]
+        return tree_item
+
+    return [build_tree(activity) for activity in rows if activity[2] == 1]
+
+
+def measure(func, rows) -> float:
+    start_time = time.perf_counter()
+    func(rows)
+    return time.perf_counter() - start_time
+
+
+def main():
+    print(f"{'nodes':>10} | {'adjacency, ms':>14} | {'legacy, ms':>12}")
+    for size in SIZES:
+        rows = generate_rows(size)
+        new_time = measure(build_activity_tree, rows) * 1000
+        legacy_time = (
+            f"{measure(build_tree_legacy, rows) * 1000:12.2f}"
+            if size <= LEGACY_MAX_SIZE
+            else f"{'-':>12}"
+        )
+        print(f"{size:>10} | {new_time:14.2f} | {legacy_time}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import json
+from decimal import Decimal
+from typing import AsyncIterable, Awaitable, Callable, Union
+
+from asyncpg import Connection
+
+from buildings.radius_cache import building_radius_cache
+from core.cache_versions import BUILDING_POINTS_CACHE, BUILDINGS_CACHE, BUMP_CACHE_VERSIONS, TILES_CACHE
+from core.config import settings
+from core.db import async_engine
+from core.logger import logger
+
+STAGING_TABLE = "buildings_import"
+STAGING_COLUMNS = ["address", "latitude", "longitude"]
+# Не больше 6 знаков после точки, как в fractional_part_validator.
+COORDINATE_PATTERN = r"^[+-]?[0-9]+(\.[0-9]{1,6})?$"
+
+CREATE_STAGING_TABLE = f"""
+    CREATE TEMPORARY TABLE {STAGING_TABLE} (
+        row_number bigint GENERATED ALWAYS AS IDENTITY,
+        address text,
+        latitude text,
+        longitude text,
+        error text
+    ) ON COMMIT DROP
+"""
+
+VALIDATE_STAGING_ROWS = f"""
+    UPDATE {STAGING_TABLE} SET error = CASE
+        WHEN coalesce(btrim(address), '') = '' THEN 'Не указан адрес.'
+        WHEN length(address) > 256 THEN 'Адрес длиннее 256 символов.'
+        WHEN latitude IS NULL OR latitude !~ '{COORDINATE_PATTERN}'
+            THEN 'Широта не число или точность больше 6 знаков.'
+        WHEN longitude IS NULL OR longitude !~ '{COORDINATE_PATTERN}'
+            THEN 'Долгота не число или точность больше 6 знаков.'
+        WHEN latitude::numeric NOT BETWEEN -90 AND 90 THEN 'Широта вне диапазона [-90, 90].'
+        WHEN longitude::numeric NOT BETWEEN -180 AND 180 THEN 'Долгота вне диапазона [-180, 180].'
+    END
+"""
+
+SELECT_ERRORS = f"""
+    SELECT row_number, error FROM {STAGING_TABLE}
+    WHERE error IS NOT NULL
+    ORDER BY row_number
+    LIMIT $1
+"""
+
+# Загрузки переносят строки в buildings по очереди: без блокировки две параллельные загрузки одного файла
+# не видят незакоммиченные строки друг друга в NOT EXISTS, и здания задваиваются. Блокировка берётся
+# только на перенос, разбор и проверка файлов идут параллельно.
+BUILDINGS_IMPORT_LOCK_KEY = 7_200_156
+LOCK_BUILDINGS_IMPORT = f"SELECT pg_advisory_xact_lock({BUILDINGS_IMPORT_LOCK_KEY})"
+
+# Точка строится в SQL, дубликаты внутри файла и уже существующие здания пропускаются.
+MERGE_STAGING_ROWS = f"""
+    INSERT INTO buildings (address, latitude, longitude, geo_point)
+    SELECT DISTINCT ON (staging.address, staging.latitude::numeric, staging.longitude::numeric)
+        staging.address,
+        staging.latitude::numeric,
+        staging.longitude::numeric,
+        ST_SetSRID(
+            ST_MakePoint(staging.longitude::double precision, staging.latitude::double precision),
+            {settings.wsg_standard}
+        )::geography
+    FROM {STAGING_TABLE} AS staging
+    WHERE staging.error IS NULL
+        AND NOT EXISTS (
+            SELECT 1 FROM buildings
+            WHERE buildings.address = staging.address
+                AND buildings.latitude = staging.latitude::numeric
+                AND buildings.longitude = staging.longitude::numeric
+        )
+"""
+
+
+def parse_geojson_buildings(data: bytes) -> list[tuple]:
+    """
+    Строки для таблицы загрузки из GeoJSON FeatureCollection с точками зданий.
+    Числа читаются как Decimal, поэтому исходная точность координат сохраняется для проверки в SQL.
+    """
+    collection = json.loads(data, parse_float=Decimal)
+    if not isinstance(collection, dict) or collection.get("type") != "FeatureCollection":
+        raise ValueError("Ожидается GeoJSON FeatureCollection.")
+    records = []
+    for feature in collection.get("features") or []:
+        feature = feature if isinstance(feature, dict) else {}
+        geometry = feature.get("geometry") or {}
+        properties = feature.get("properties") or {}
+        address = properties.get("address")
+        coordinates = geometry.get("coordinates") if geometry.get("type") == "Point" else None
+        longitude, latitude = None, None
+        if isinstance(coordinates, list) and len(coordinates) >= 2:
+            longitude, latitude = coordinates[:2]
+        records.append(
+            (
+                str(address) if address is not None else None,
+                str(latitude) if latitude is not None else None,
+                str(longitude) if longitude is not None else None,
+            )
+        )
+    return records
+
+
+async def import_buildings(
+    load_staging: Callable[[Connection], Awaitable], strict: bool = False
+) -> dict:
+    """
+    Массовая загрузка зданий через временную таблицу в одной транзакции.
+    Строки проверяются одним UPDATE, корректные переносятся в buildings одним INSERT ... SELECT.
+    В режиме strict при любой ошибке ничего не загружается.
+    """
+    async with async_engine.connect() as connection:
+        raw_connection = await connection.get_raw_connection()
+        driver_connection: Connection = raw_connection.driver_connection
+        async with driver_connection.transaction():
+            await driver_connection.execute(CREATE_STAGING_TABLE)
+            await load_staging(driver_connection)
+            await driver_connection.execute(VALIDATE_STAGING_ROWS)
+            received, invalid = await driver_connection.fetchrow(
+                f"SELECT count(*), count(error) FROM {STAGING_TABLE}"
+            )
+            errors = [
+                {"row": row["row_number"], "error": row["error"]}
+                for row in await driver_connection.fetch(SELECT_ERRORS, settings.import_error_sample_size)
+            ]
+            report = {
+                "received": received,
+                "invalid": invalid,
+                "imported": 0,
+                "skipped_duplicates": 0,
+                "errors": errors,
+                "aborted": strict and invalid > 0,
+            }
+            if report["aborted"]:
+                # Временная таблица удаляется вместе с транзакцией, в buildings ничего не записывается.
+                logger.debug(f"Загрузка зданий отменена, строк с ошибками: {invalid}.")
+                return report
+            # В READ COMMITTED следующий запрос после ожидания блокировки видит здания предыдущей загрузки.
+            await driver_connection.execute(LOCK_BUILDINGS_IMPORT)
+            status = await driver_connection.execute(MERGE_STAGING_ROWS)
+            report["imported"] = int(status.split()[-1])
+            if report["imported"]:
+                await driver_connection.execute(BUMP_CACHE_VERSIONS, [TILES_CACHE, BUILDING_POINTS_CACHE, BUILDINGS_CACHE])
+            report["skipped_duplicates"] = received - invalid - report["imported"]
+
+    if report["imported"]:
+        building_radius_cache.clear()
+    logger.info(
+        f"Загрузка зданий завершена: получено {received}, загружено {report['imported']}, с ошибками {invalid}."
+    )
+    return report
+
+
+async def import_buildings_csv(
+    source: Union[str, AsyncIterable[bytes]], strict: bool = False
+) -> dict:
+    """Загрузка CSV (address,latitude,longitude с заголовком) потоком через COPY, файл целиком в память не читается."""
+
+    async def load_staging(connection: Connection):
+        await connection.copy_to_table(
+            STAGING_TABLE, source=source, columns=STAGING_COLUMNS, format="csv", header=True
+        )
+
+    return await import_buildings(load_staging, strict=strict)
+
+
+async def import_buildings_geojson(data: bytes, strict: bool = False) -> dict:
+    """Загрузка GeoJSON FeatureCollection через бинарный COPY записей."""
+    records = parse_geojson_buildings(data)
+
+    async def load_staging(connection: Connection):
+        await connection.copy_records_to_table(STAGING_TABLE, records=records, columns=STAGING_COLUMNS)
+
+    return await import_buildings(load_staging, strict=strict)
@@ -1,20 +1,43 @@
+from bisect import bisect_right
 from decimal import Decimal
+from typing import AsyncIterator, Optional
 
+from fastapi import HTTPException, status
 from fastapi.encoders import jsonable_encoder
 from geoalchemy2.functions import ST_DWithin
-from sqlalchemy import select, func
+from geoalchemy2 import Geography, Geometry
+from sqlalchemy import JSON, Integer, and_, any_, cast, literal, select, func, text, true, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import aliased, joinedload, selectinload
 
+from buildings.geo import SPHEROID_TOLERANCE
+from buildings.radius_cache import building_radius_cache
+from buildings.schemas import BuildingDB
+from buildings.spatial_index import building_spatial_index
+from core.cache_versions import BUILDING_POINTS_CACHE, BUILDINGS_CACHE, TILES_CACHE, bump_cache_versions
 from core.config import settings
 from core.crud_foundation import CRUDBase
 from core.logger import logger
-from core.models import Building
+from core.pagination import decode_cursor, encode_cursor, is_cursor_integer, is_cursor_number
+from core.models import Building, Organization, activity_closure, organization_activity
+from organizations.outbox import enqueue_organizations_sync_where
+
+RADIUS_CURSOR_DB = "db"
+RADIUS_CURSOR_CACHE = "cache"
 
 
 class BuildingCRUD(CRUDBase):
 
+    @staticmethod
+    def make_point(latitude: Decimal, longitude: Decimal):
+        """Точка запроса в типе geography, чтобы сравнение с buildings.geo_point использовало GiST индекс."""
+        return cast(
+            func.ST_SetSRID(func.ST_MakePoint(longitude, latitude), settings.wsg_standard),
+            Geography(geometry_type="POINT", srid=settings.wsg_standard),
+        )
+
     async def get_with_organizations(
         self,
         obj_id: int,
@@ -35,18 +58,308 @@ class BuildingCRUD(CRUDBase):
             latitude: Decimal,
             longitude: Decimal,
             radius_km: int,
-            session: AsyncSession
-    ):
-        """Получение списка зданий находящихся в радиусе от переданной в запросе точки."""
-        point = func.ST_SetSRID(func.ST_MakePoint(longitude, latitude), settings.wsg_standard)
+            session: AsyncSession,
+            limit: int = settings.default_page_size,
+            after: Optional[str] = None,
+    ) -> dict:
+        """
+        Получение страницы зданий находящихся в радиусе от переданной в запросе точки, отсортированных по расстоянию.
+        Постраничная выборка идёт по ключу (расстояние, id), расстояние в метрах записывается в атрибут distance_m.
+        """
+        after_key = self.decode_radius_cursor(after) if after else None
+        if building_radius_cache.supports(radius_km):
+            matched = await building_radius_cache.query(
+                float(latitude),
+                float(longitude),
+                radius_km,
+                loader=lambda center_latitude, center_longitude, radius_m, max_count: self.get_radius_superset(
+                    center_latitude, center_longitude, radius_m, max_count, session
+                ),
+            )
+            if matched is not None:
+                return self.paginate_cached_radius(matched, limit, after_key)
+
+        point = self.make_point(latitude, longitude)
         logger.debug("Точка отсчёта подготовлена для запроса.")
         radius_meters = radius_km * settings.meter_coefficient
+        distance = func.ST_Distance(self.model.geo_point, point)
+        radius_filter = ST_DWithin(self.model.geo_point, point, radius_meters)
+        if building_spatial_index.is_ready:
+            candidate_ids = building_spatial_index.query_radius(
+                float(latitude), float(longitude), radius_meters * (1 + SPHEROID_TOLERANCE)
+            )
+            if not candidate_ids:
+                return {"items": [], "next_cursor": None}
+            radius_filter = and_(self.model.id == any_(literal(candidate_ids, ARRAY(Integer))), radius_filter)
+
+        query = (
+            select(self.model, distance.label("distance_m"))
+            .where(radius_filter)
+            .order_by(distance, self.model.id)
+            .limit(limit + 1)
+            .options(selectinload(self.model.organizations))
+        )
+        if after_key is not None:
+            after_distance, after_id, source = after_key
+            if source != RADIUS_CURSOR_DB:
+                # Курсор выдан кэшем, расстояние граничного здания пересчитывается в метрике PostGIS.
+                boundary = aliased(self.model)
+                after_distance = func.coalesce(
+                    select(func.ST_Distance(boundary.geo_point, point))
+                    .where(boundary.id == after_id)
+                    .scalar_subquery(),
+                    after_distance,
+                )
+            query = query.where(tuple_(distance, self.model.id) > tuple_(after_distance, after_id))
+
+        result = await session.execute(query)
+        rows = result.all()
+        buildings = []
+        for building, distance_m in rows[:limit]:
+            building.distance_m = distance_m
+            buildings.append(building)
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = encode_cursor(buildings[-1].distance_m, buildings[-1].id, RADIUS_CURSOR_DB)
+        return {"items": buildings, "next_cursor": next_cursor}
+
+    @staticmethod
+    def decode_distance_cursor(after: str) -> tuple[float, int]:
+        after_distance, after_id = decode_cursor(after, size=2)
+        if not is_cursor_number(after_distance) or not is_cursor_integer(after_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Некорректный курсор постраничной выборки.",
+            )
+        return after_distance, after_id
+
+    @staticmethod
+    def decode_radius_cursor(after: str) -> tuple[float, int, str]:
+        """
+        Курсор зданий в радиусе помнит, какой путь его выдал: кэш считает расстояние по локальному эллипсоиду,
+        а БД - через ST_Distance, поэтому при смене пути граница страницы пересчитывается по id здания.
+        """
+        after_distance, after_id, source = decode_cursor(after, size=3)
+        if (
+            not is_cursor_number(after_distance)
+            or not is_cursor_integer(after_id)
+            or source not in (RADIUS_CURSOR_DB, RADIUS_CURSOR_CACHE)
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Некорректный курсор постраничной выборки.",
+            )
+        return after_distance, after_id, source
 
+    async def get_radius_superset(
+            self,
+            latitude: float,
+            longitude: float,
+            radius_m: float,
+            max_count: int,
+            session: AsyncSession,
+    ) -> list[tuple[int, float, float, dict]]:
+        """Здания в радиусе для кэша запросов по радиусу: id, координаты и данные в формате ответа без расстояния."""
+        point = self.make_point(latitude, longitude)
         result = await session.execute(
             select(self.model)
-            .where(ST_DWithin(self.model.geo_point, point, radius_meters))
-            .options(joinedload(self.model.organizations)))
-        return result.unique().scalars().all()
+            .where(ST_DWithin(self.model.geo_point, point, radius_m))
+            .limit(max_count)
+            .options(selectinload(self.model.organizations))
+        )
+        return [
+            (
+                building.id,
+                float(building.latitude),
+                float(building.longitude),
+                BuildingDB.model_validate(building).model_dump(),
+            )
+            for building in result.scalars().all()
+        ]
+
+    @staticmethod
+    def paginate_cached_radius(
+            matched: list[tuple[float, int, dict]],
+            limit: int,
+            after_key: Optional[tuple[float, int, str]],
+    ) -> dict:
+        """Страница из отсортированных по (расстояние, id) зданий кэша с курсором того же формата, что и у запроса в БД."""
+        start = 0
+        if after_key is not None:
+            after_distance, after_id, source = after_key
+            if source != RADIUS_CURSOR_CACHE:
+                # Курсор выдан запросом в БД, граница ищется по id здания в метрике кэша.
+                after_distance = next(
+                    (distance for distance, building_id, _ in matched if building_id == after_id), after_distance
+                )
+            start = bisect_right(matched, (after_distance, after_id), key=lambda item: item[:2])
+        page = matched[start:start + limit]
+        items = [{**payload, "distance_m": distance} for distance, _, payload in page]
+        next_cursor = None
+        if len(matched) > start + limit:
+            next_cursor = encode_cursor(page[-1][0], page[-1][1], RADIUS_CURSOR_CACHE)
+        return {"items": items, "next_cursor": next_cursor}
+
+    async def get_nearest_buildings(
+            self,
+            latitude: Decimal,
+            longitude: Decimal,
+            limit: int,
+            session: AsyncSession
+    ):
+        """
+        Получение ближайших к точке зданий через KNN оператор <->, выборка идёт по GiST индексу geo_point.
+        При включённом пространственном индексе в памяти кандидаты выбираются в нём, а БД только загружает здания по id.
+        Расстояние в метрах записывается в атрибут distance_m каждого здания.
+        """
+        point = self.make_point(latitude, longitude)
+        distance = func.ST_Distance(self.model.geo_point, point)
+        query = (
+            select(self.model, distance.label("distance_m"))
+            .where(self.model.geo_point.is_not(None))
+            .limit(limit)
+            .options(selectinload(self.model.organizations))
+        )
+        if building_spatial_index.is_ready:
+            # Кандидаты берутся из индекса с запасом, окончательный порядок задаёт расстояние PostGIS по эллипсоиду.
+            candidate_ids = building_spatial_index.nearest(float(latitude), float(longitude), limit * 2)
+            if not candidate_ids:
+                return []
+            query = query.where(
+                self.model.id == any_(literal(candidate_ids, ARRAY(Integer)))
+            ).order_by(distance, self.model.id)
+        else:
+            query = query.order_by(self.model.geo_point.op("<->")(point))
+        result = await session.execute(query)
+        buildings = []
+        for building, distance_m in result.all():
+            building.distance_m = distance_m
+            buildings.append(building)
+        return buildings
+
+    def bbox_filter(
+            self,
+            min_latitude: Decimal,
+            min_longitude: Decimal,
+            max_latitude: Decimal,
+            max_longitude: Decimal,
+    ):
+        """
+        Условие попадания здания в прямоугольник карты. Сравнение идёт в плоских координатах по GiST индексу
+        на выражении geo_point::geometry: прямоугольник, приведённый к geography, получил бы стороны по дугам
+        большого круга, и на широких экранах && отбросил бы здания у его южной или северной стороны.
+        """
+        envelope = func.ST_MakeEnvelope(
+            min_longitude, min_latitude, max_longitude, max_latitude, settings.wsg_standard
+        )
+        geometry = cast(self.model.geo_point, Geometry(srid=settings.wsg_standard))
+        return and_(geometry.op("&&")(envelope), func.ST_Intersects(geometry, envelope))
+
+    def polygon_filter(self, geojson: str):
+        """Условие попадания здания в произвольный полигон, переданный в формате GeoJSON."""
+        polygon = func.ST_SetSRID(func.ST_GeomFromGeoJSON(geojson), settings.wsg_standard)
+        return func.ST_Intersects(self.model.geo_point, cast(polygon, Geography(srid=settings.wsg_standard)))
+
+    async def stream_buildings_in_area(
+            self,
+            area_filter,
+            with_organizations: bool,
+            session: AsyncSession,
+            chunk_size: int,
+    ) -> AsyncIterator[dict]:
+        """
+        Потоковая выборка зданий в области серверным курсором.
+        Организации по запросу агрегируются в JSON на стороне БД, без загрузки ORM объектов.
+        """
+        query = (
+            select(
+                self.model.id,
+                self.model.address,
+                self.model.latitude,
+                self.model.longitude,
+                self.model.create_date,
+                self.model.update_date,
+            )
+            .where(area_filter)
+            .order_by(self.model.id)
+        )
+        if with_organizations:
+            organizations = (
+                select(
+                    func.coalesce(
+                        func.json_agg(
+                            func.json_build_object(
+                                "id", Organization.id,
+                                "name", Organization.name,
+                                "phones", Organization.phones,
+                                "building_id", Organization.building_id,
+                            )
+                        ),
+                        text("'[]'::json"),
+                        type_=JSON,
+                    ).label("organizations")
+                )
+                .where(Organization.building_id == self.model.id)
+                .lateral("building_organizations_agg")
+            )
+            query = query.add_columns(organizations.c.organizations).join(organizations, true())
+        result = await session.stream(query.execution_options(yield_per=chunk_size))
+        async for partition in result.mappings().partitions():
+            for row in partition:
+                yield dict(row)
+
+    async def get_clusters(
+            self,
+            min_latitude: Decimal,
+            min_longitude: Decimal,
+            max_latitude: Decimal,
+            max_longitude: Decimal,
+            zoom: int,
+            method: str,
+            activity_id: Optional[int],
+            session: AsyncSession,
+    ) -> list[dict]:
+        """
+        Агрегация зданий прямоугольника в ячейки сетки или geohash, размер ячейки зависит от масштаба карты.
+        Центроиды и количества считаются в PostGIS, при переданном activity_id учитываются только здания
+        с организациями из ветки этого вида деятельности.
+        """
+        geometry = cast(self.model.geo_point, Geometry(srid=settings.wsg_standard))
+        if method == "geohash":
+            precision = min(max(round(2 * (zoom + 3) / 5), 1), 12)
+            cell = func.ST_GeoHash(geometry, precision)
+        else:
+            cell_size = 360 / 2 ** zoom / settings.cluster_cells_per_tile
+            cell = func.ST_AsText(func.ST_SnapToGrid(geometry, cell_size))
+        centroid = func.ST_Centroid(func.ST_Collect(geometry))
+
+        query = (
+            select(
+                cell.label("cell"),
+                func.ST_Y(centroid).label("latitude"),
+                func.ST_X(centroid).label("longitude"),
+                func.count(self.model.id).label("buildings_count"),
+            )
+            .where(self.bbox_filter(min_latitude, min_longitude, max_latitude, max_longitude))
+            .group_by(cell)
+        )
+        if activity_id is not None:
+            # Организации считаются коррелированно для каждого здания прямоугольника по индексу building_id,
+            # поэтому стоимость зависит от размера экрана, а не от числа организаций во всей ветке.
+            matching = (
+                select(func.count(Organization.id.distinct()).label("organizations_count"))
+                .join(organization_activity, organization_activity.c.organization_id == Organization.id)
+                .join(activity_closure, activity_closure.c.descendant_id == organization_activity.c.activity_id)
+                .where(Organization.building_id == self.model.id, activity_closure.c.ancestor_id == activity_id)
+                .lateral("matching_organizations")
+            )
+            query = (
+                query.add_columns(func.sum(matching.c.organizations_count).label("organizations_count"))
+                .join(matching, true())
+                .where(matching.c.organizations_count > 0)
+            )
+        result = await session.execute(query)
+        return [dict(row) for row in result.mappings().all()]
 
     async def create(self, create_data, session: AsyncSession):
         """Создание здания."""
@@ -56,8 +369,11 @@ class BuildingCRUD(CRUDBase):
         new_obj = self.model(**create_data)
         try:
             session.add(new_obj)
+            await bump_cache_versions(session, TILES_CACHE, BUILDING_POINTS_CACHE, BUILDINGS_CACHE)
             await session.commit()
             await session.refresh(new_obj)
+            building_spatial_index.upsert(new_obj.id, new_obj.latitude, new_obj.longitude)
+            building_radius_cache.invalidate_point(float(new_obj.latitude), float(new_obj.longitude))
             return new_obj
         except IntegrityError as e:
             await session.rollback()
@@ -88,11 +404,35 @@ class BuildingCRUD(CRUDBase):
                 setattr(db_obj, field, update_data[field])
         try:
             session.add(db_obj)
+            if update_data.keys() & {"address", "latitude", "longitude"}:
+                await enqueue_organizations_sync_where(session, Organization.building_id == db_obj.id)
+                logger.debug("Организации здания поставлены в очередь на обновление в Elastic Search.")
+            if update_data.keys() & {"latitude", "longitude"}:
+                await bump_cache_versions(session, TILES_CACHE, BUILDING_POINTS_CACHE, BUILDINGS_CACHE)
+            else:
+                await bump_cache_versions(session, TILES_CACHE, BUILDINGS_CACHE)
             await session.commit()
             await session.refresh(db_obj)
+            building_spatial_index.upsert(db_obj.id, db_obj.latitude, db_obj.longitude)
+            building_radius_cache.invalidate_buildings({db_obj.id})
+            building_radius_cache.invalidate_point(float(db_obj.latitude), float(db_obj.longitude))
             return db_obj
         except IntegrityError as e:
             await session.rollback()
             await self.handle_integrity_error(e)
 
+    @staticmethod
+    async def remove(
+        db_obj,
+        session: AsyncSession,
+    ):
+        """Удаление здания, у организаций здания ссылка на него обнуляется, поэтому их документы переиндексируются."""
+        await enqueue_organizations_sync_where(session, Organization.building_id == db_obj.id)
+        await session.delete(db_obj)
+        await bump_cache_versions(session, TILES_CACHE, BUILDING_POINTS_CACHE, BUILDINGS_CACHE)
+        await session.commit()
+        building_spatial_index.remove(db_obj.id)
+        building_radius_cache.invalidate_buildings({db_obj.id})
+        return db_obj
+
 building_crud = BuildingCRUD(Building)
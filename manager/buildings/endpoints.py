@@ -1,13 +1,33 @@
+import json
 from decimal import Decimal
+from typing import Literal, Optional
 
-from fastapi import APIRouter, HTTPException, status
+from asyncpg.exceptions import DataError
+from fastapi import APIRouter, HTTPException, Request, Response, status
 from fastapi.params import Depends, Path, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from buildings.bulk_import import import_buildings_csv, import_buildings_geojson
 from buildings.crud import building_crud
-from buildings.schemas import BuildingCreate, BuildingUpdate, BuildingDB, BuildingShortDB
+from buildings.geojson import feature_collection_response
+from buildings.schemas import (
+    BuildingClusterDB,
+    BuildingCreate,
+    BuildingImportReport,
+    BuildingUpdate,
+    BuildingDB,
+    BuildingShortDB,
+    BuildingWithDistanceDB,
+    GeoJSONPolygon,
+)
+from buildings.validators import polygon_validity_error
 from core.authentication_utils import check_token
+from core.config import settings
 from core.db import get_async_session
+from core.pagination import Page, PaginationParams
+from core.routing import get_routed_session, read_session_factory, stick_to_primary
+from core.streaming import ndjson_chunks
 from core.utils import Tags, check_exists_and_get_or_return_error
 
 router = APIRouter(
@@ -22,7 +42,7 @@ router = APIRouter(
     response_model=BuildingDB
 )
 async def get_building_by_id(
-        building_id: int = Path(...), session: AsyncSession = Depends(get_async_session)
+        building_id: int = Path(...), session: AsyncSession = Depends(get_routed_session)
 ):
     return await check_exists_and_get_or_return_error(
         db_id=building_id,
@@ -36,13 +56,22 @@ async def get_building_by_id(
 
 @router.get(
     "/get-all",
-    response_model=list[BuildingShortDB]
+    response_model=Page[BuildingShortDB]
 )
 async def get_all_buildings(
-        session: AsyncSession = Depends(get_async_session),
+        pagination: PaginationParams = Depends(),
+        response_format: Literal["json", "geojson"] = Query("json", alias="format"),
+        session: AsyncSession = Depends(get_routed_session),
 ):
     try:
-        return await building_crud.get_multi(session=session)
+        page = await building_crud.get_page(
+            session=session, limit=pagination.limit, after=pagination.after
+        )
+        if response_format == "geojson":
+            return feature_collection_response(page["items"], BuildingShortDB, page["next_cursor"])
+        return page
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             detail=f"{e}",
@@ -52,19 +81,52 @@ async def get_all_buildings(
 
 @router.get(
     "/get-in_radius",
-    response_model=list[BuildingDB]
+    response_model=Page[BuildingWithDistanceDB]
 )
 async def get_all_buildings_in_radius(
-        radius_km: int = Query(1, ge=0),
+        radius_km: int = Query(1, ge=0, le=settings.max_radius_km),
         latitude: Decimal = Query(..., ge=-90, le=90),
         longitude: Decimal = Query(..., ge=-180, le=180),
+        pagination: PaginationParams = Depends(),
+        response_format: Literal["json", "geojson"] = Query("json", alias="format"),
         session: AsyncSession = Depends(get_async_session),
 ):
     try:
-        return await building_crud.get_buildings_in_radius(
+        page = await building_crud.get_buildings_in_radius(
             radius_km=radius_km,
             latitude=latitude,
             longitude=longitude,
+            session=session,
+            limit=pagination.limit,
+            after=pagination.after,
+        )
+        if response_format == "geojson":
+            return feature_collection_response(page["items"], BuildingWithDistanceDB, page["next_cursor"])
+        return page
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            detail=f"{e}",
+            status_code=500,
+        )
+
+
+@router.get(
+    "/nearest",
+    response_model=list[BuildingWithDistanceDB]
+)
+async def get_nearest_buildings(
+        latitude: Decimal = Query(..., ge=-90, le=90),
+        longitude: Decimal = Query(..., ge=-180, le=180),
+        limit: int = Query(10, ge=1, le=100),
+        session: AsyncSession = Depends(get_routed_session),
+):
+    try:
+        return await building_crud.get_nearest_buildings(
+            latitude=latitude,
+            longitude=longitude,
+            limit=limit,
             session=session
         )
     except Exception as e:
@@ -74,12 +136,139 @@ async def get_all_buildings_in_radius(
         )
 
 
+def stream_buildings_response(area_filter, with_organizations: bool, request: Request) -> StreamingResponse:
+    session_factory = read_session_factory(request)
+
+    async def buildings_stream():
+        # Сессия открывается внутри генератора, так как сессия из зависимости закрывается до отправки тела ответа.
+        async with session_factory() as session:
+            rows = building_crud.stream_buildings_in_area(
+                area_filter=area_filter,
+                with_organizations=with_organizations,
+                session=session,
+                chunk_size=settings.export_chunk_size,
+            )
+            async for chunk in ndjson_chunks(rows, settings.export_chunk_size):
+                yield chunk
+
+    return StreamingResponse(buildings_stream(), media_type="application/x-ndjson")
+
+
+@router.get("/in-bbox")
+async def get_buildings_in_bbox(
+        request: Request,
+        min_latitude: Decimal = Query(..., ge=-90, le=90),
+        min_longitude: Decimal = Query(..., ge=-180, le=180),
+        max_latitude: Decimal = Query(..., ge=-90, le=90),
+        max_longitude: Decimal = Query(..., ge=-180, le=180),
+        with_organizations: bool = False,
+):
+    if min_latitude > max_latitude or min_longitude > max_longitude:
+        raise HTTPException(
+            detail="Минимальные границы прямоугольника должны быть меньше максимальных.",
+            status_code=400,
+        )
+    return stream_buildings_response(
+        area_filter=building_crud.bbox_filter(min_latitude, min_longitude, max_latitude, max_longitude),
+        with_organizations=with_organizations,
+        request=request,
+    )
+
+
+@router.post("/in-polygon")
+async def get_buildings_in_polygon(
+        request: Request,
+        polygon: GeoJSONPolygon,
+        with_organizations: bool = False,
+):
+    # Ошибка геометрии после начала потоковой выдачи оборвала бы ответ со статусом 200, поэтому проверка до неё.
+    validity_error = polygon_validity_error(polygon.model_dump())
+    if validity_error is not None:
+        raise HTTPException(
+            detail=f"Некорректный полигон: {validity_error}.",
+            status_code=400,
+        )
+    return stream_buildings_response(
+        area_filter=building_crud.polygon_filter(json.dumps(polygon.model_dump())),
+        with_organizations=with_organizations,
+        request=request,
+    )
+
+
+@router.get(
+    "/clusters",
+    response_model=list[BuildingClusterDB]
+)
+async def get_building_clusters(
+        min_latitude: Decimal = Query(..., ge=-90, le=90),
+        min_longitude: Decimal = Query(..., ge=-180, le=180),
+        max_latitude: Decimal = Query(..., ge=-90, le=90),
+        max_longitude: Decimal = Query(..., ge=-180, le=180),
+        zoom: int = Query(..., ge=0, le=22),
+        method: Literal["grid", "geohash"] = Query("grid"),
+        activity_id: Optional[int] = None,
+        session: AsyncSession = Depends(get_routed_session),
+):
+    if min_latitude > max_latitude or min_longitude > max_longitude:
+        raise HTTPException(
+            detail="Минимальные границы прямоугольника должны быть меньше максимальных.",
+            status_code=400,
+        )
+    try:
+        return await building_crud.get_clusters(
+            min_latitude=min_latitude,
+            min_longitude=min_longitude,
+            max_latitude=max_latitude,
+            max_longitude=max_longitude,
+            zoom=zoom,
+            method=method,
+            activity_id=activity_id,
+            session=session,
+        )
+    except Exception as e:
+        raise HTTPException(
+            detail=f"{e}",
+            status_code=500,
+        )
+
+
+@router.post(
+    "/import",
+    response_model=BuildingImportReport
+)
+async def import_buildings(
+        request: Request,
+        response: Response,
+        import_format: Literal["csv", "geojson"] = Query("csv", alias="format"),
+        strict: bool = False,
+):
+    try:
+        if import_format == "geojson":
+            report = await import_buildings_geojson(await request.body(), strict=strict)
+        else:
+            report = await import_buildings_csv(request.stream(), strict=strict)
+    except (ValueError, DataError) as e:
+        raise HTTPException(
+            detail=f"Файл не может быть загружен: {e}",
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+    except Exception as e:
+        raise HTTPException(
+            detail=f"{e}",
+            status_code=500,
+        )
+    if report["aborted"]:
+        raise HTTPException(detail=report, status_code=status.HTTP_400_BAD_REQUEST)
+    stick_to_primary(response)
+    return report
+
+
 @router.post(
     "/create",
     response_model=BuildingShortDB
 )
 async def create_building(
-        building_data: BuildingCreate, session: AsyncSession = Depends(get_async_session)
+        building_data: BuildingCreate, session: AsyncSession = Depends(get_routed_session)
 ):
     return await building_crud.create(building_data, session)
 
@@ -91,7 +280,7 @@ async def create_building(
 async def update_building(
         building_data: BuildingUpdate,
         building_id: int = Path(...),
-        session: AsyncSession = Depends(get_async_session),
+        session: AsyncSession = Depends(get_routed_session),
 ):
     building = await check_exists_and_get_or_return_error(
         db_id=building_id,
@@ -109,7 +298,7 @@ async def update_building(
 @router.delete("/delete-building-by-id/{building_id}")
 async def delete_building_by_id(
         building_id: int = Path(...),
-        session: AsyncSession = Depends(get_async_session),
+        session: AsyncSession = Depends(get_routed_session),
 ):
     building = await check_exists_and_get_or_return_error(
         db_id=building_id,
@@ -0,0 +1,91 @@
+import numpy as np
+
+EARTH_RADIUS_M = 6_371_008.8
+# Расстояние по сфере отличается от расстояния PostGIS по эллипсоиду WGS 84 не более чем на 0.5%,
+# поэтому отбор кандидатов по сфере выполняется с этим запасом.
+SPHEROID_TOLERANCE = 0.005
+
+WGS84_A = 6_378_137.0
+WGS84_E2 = 0.00669437999014
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def haversine_m(
+    latitude: float, longitude: float, latitudes: np.ndarray, longitudes: np.ndarray
+) -> np.ndarray:
+    """Расстояния в метрах по сфере от точки до массива точек, координаты в градусах."""
+    lat1 = np.radians(latitude)
+    lat2 = np.radians(latitudes)
+    delta_lat = lat2 - lat1
+    delta_lon = np.radians(longitudes - longitude)
+    a = np.sin(delta_lat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(delta_lon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def latitude_delta(radius_m: float) -> float:
+    """Полуширина полосы широт в градусах, внутри которой лежат все точки круга радиуса radius_m."""
+    return float(np.degrees(radius_m / EARTH_RADIUS_M))
+
+
+def local_ellipsoid_distance_m(
+    latitude: float, longitude: float, latitudes: np.ndarray, longitudes: np.ndarray
+) -> np.ndarray:
+    """
+    Расстояния в метрах по эллипсоиду WGS 84 в локальном приближении (радиусы кривизны на средней широте).
+    На расстояниях до десятков километров расхождение с ST_Distance по geography не превышает долей метра.
+    """
+    mean_latitude = np.radians((latitudes + latitude) / 2)
+    sin_squared = np.sin(mean_latitude) ** 2
+    meridian_radius = WGS84_A * (1 - WGS84_E2) / (1 - WGS84_E2 * sin_squared) ** 1.5
+    normal_radius = WGS84_A / np.sqrt(1 - WGS84_E2 * sin_squared)
+    north = meridian_radius * np.radians(latitudes - latitude)
+    east = normal_radius * np.cos(mean_latitude) * np.radians(longitudes - longitude)
+    return np.hypot(north, east)
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int) -> str:
+    """Geohash точки заданной длины."""
+    latitude_range = [-90.0, 90.0]
+    longitude_range = [-180.0, 180.0]
+    geohash = []
+    bits, bit_count, even = 0, 0, True
+    while len(geohash) < precision:
+        value, value_range = (longitude, longitude_range) if even else (latitude, latitude_range)
+        middle = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            value_range[0] = middle
+        else:
+            value_range[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return "".join(geohash)
+
+
+def geohash_cell_size(precision: int) -> tuple[float, float]:
+    """Высота и ширина ячейки geohash заданной длины в градусах."""
+    longitude_bits = (5 * precision + 1) // 2
+    latitude_bits = 5 * precision // 2
+    return 180.0 / 2 ** latitude_bits, 360.0 / 2 ** longitude_bits
+
+
+def geohash_cell_center(geohash: str) -> tuple[float, float]:
+    """Центр ячейки geohash (широта, долгота)."""
+    latitude_range = [-90.0, 90.0]
+    longitude_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        bits = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            value_range = longitude_range if even else latitude_range
+            middle = (value_range[0] + value_range[1]) / 2
+            if bits >> shift & 1:
+                value_range[0] = middle
+            else:
+                value_range[1] = middle
+            even = not even
+    return (latitude_range[0] + latitude_range[1]) / 2, (longitude_range[0] + longitude_range[1]) / 2
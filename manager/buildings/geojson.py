@@ -0,0 +1,38 @@
+from typing import Iterable, Optional
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+GEOJSON_MEDIA_TYPE = "application/geo+json"
+POINT_FIELDS = {"geo_point", "latitude", "longitude"}
+
+
+def building_feature(building, schema: type[BaseModel]) -> dict:
+    """
+    Здание (объект ORM или словарь из кэша) в виде GeoJSON Feature,
+    координаты берутся из числовых колонок без разбора WKB.
+    """
+    building = schema.model_validate(building)
+    return {
+        "type": "Feature",
+        "id": building.id,
+        "geometry": {
+            "type": "Point",
+            "coordinates": [float(building.longitude), float(building.latitude)],
+        },
+        "properties": building.model_dump(mode="json", exclude=POINT_FIELDS),
+    }
+
+
+def feature_collection_response(
+    buildings: Iterable, schema: type[BaseModel], next_cursor: Optional[str] = None
+) -> JSONResponse:
+    """Ответ в формате GeoJSON FeatureCollection, курсор следующей страницы передаётся отдельным полем."""
+    return JSONResponse(
+        content={
+            "type": "FeatureCollection",
+            "features": [building_feature(building, schema) for building in buildings],
+            "next_cursor": next_cursor,
+        },
+        media_type=GEOJSON_MEDIA_TYPE,
+    )
@@ -0,0 +1,203 @@
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+import numpy as np
+
+from buildings.geo import (
+    geohash_cell_center,
+    geohash_cell_size,
+    geohash_encode,
+    local_ellipsoid_distance_m,
+)
+from core.cache_versions import BUILDINGS_CACHE, cache_versions
+from core.config import settings
+from core.logger import logger
+
+MAX_GEOHASH_PRECISION = 9
+METERS_PER_DEGREE = 111_320.0
+
+
+class RadiusCacheEntry:
+    """Здания в круге вокруг центра ячейки geohash, покрывающем запросы из любой точки этой ячейки."""
+
+    __slots__ = ("latitude", "longitude", "radius_m", "ids", "latitudes", "longitudes", "payloads", "expires_at")
+
+    def __init__(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_m: float,
+        buildings: Optional[list[tuple[int, float, float, dict]]],
+        expires_at: float,
+    ):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.radius_m = radius_m
+        self.expires_at = expires_at
+        # Запись без зданий означает, что надмножество слишком велико для кэша и запросы идут напрямую в БД.
+        self.payloads = None
+        if buildings is not None:
+            self.ids = np.array([building[0] for building in buildings], dtype=np.int64)
+            self.latitudes = np.array([building[1] for building in buildings], dtype=np.float64)
+            self.longitudes = np.array([building[2] for building in buildings], dtype=np.float64)
+            self.payloads = [building[3] for building in buildings]
+
+    def covers_point(self, latitude: float, longitude: float) -> bool:
+        distance = local_ellipsoid_distance_m(
+            self.latitude, self.longitude, np.array([latitude]), np.array([longitude])
+        )
+        return bool(distance[0] <= self.radius_m)
+
+    def contains_buildings(self, building_ids: set[int]) -> bool:
+        return self.payloads is not None and bool(np.isin(self.ids, list(building_ids)).any())
+
+
+class BuildingRadiusCache:
+    """
+    Кэш запросов зданий по радиусу с квантованием центра: ключом служат ячейка geohash центра и радиус в км.
+    В записи хранится надмножество зданий для любого центра внутри ячейки, точный отбор по радиусу,
+    сортировка и постраничная выборка выполняются в памяти процесса. Записи вытесняются по LRU и TTL.
+    Записи принадлежат версии BUILDINGS_CACHE: запись зданий или их организаций в любом процессе приложения
+    увеличивает её и сбрасывает кэш целиком. Изменения в этом процессе сразу сбрасывают записи, в круг которых
+    попадает здание, не дожидаясь уведомления.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        max_entries: int,
+        ttl_seconds: float,
+        max_radius_km: int,
+        max_buildings: int,
+        cell_ratio: float,
+    ):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_radius_km = max_radius_km
+        self.max_buildings = max_buildings
+        self.cell_ratio = cell_ratio
+        self.version = 0
+        self.shared_version: Optional[int] = None
+        self._entries: OrderedDict[tuple[str, int], RadiusCacheEntry] = OrderedDict()
+
+    def supports(self, radius_km: int) -> bool:
+        return self.enabled and 0 < radius_km <= self.max_radius_km
+
+    def cell_precision(self, latitude: float, radius_m: float) -> int:
+        """Самая короткая длина geohash, при которой половина диагонали ячейки не больше доли радиуса."""
+        for precision in range(1, MAX_GEOHASH_PRECISION + 1):
+            height, width = geohash_cell_size(precision)
+            half_diagonal = METERS_PER_DEGREE * np.hypot(height, width * np.cos(np.radians(latitude))) / 2
+            if half_diagonal <= radius_m * self.cell_ratio:
+                return precision
+        return MAX_GEOHASH_PRECISION
+
+    async def query(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: int,
+        loader: Callable[[float, float, float, int], Awaitable[list[tuple[int, float, float, dict]]]],
+    ) -> Optional[list[tuple[float, int, dict]]]:
+        """
+        Здания в радиусе от точки в виде (расстояние, id, данные), отсортированные по расстоянию и id.
+        Возвращает None, если запрос нужно выполнить в БД: надмножество для ячейки слишком велико
+        или версия BUILDINGS_CACHE неизвестна, так как уведомления об изменениях сейчас не принимаются.
+        """
+        shared_version = cache_versions.version(BUILDINGS_CACHE)
+        if shared_version is None:
+            return None
+        if shared_version != self.shared_version:
+            self._entries.clear()
+            self.shared_version = shared_version
+
+        radius_m = radius_km * settings.meter_coefficient
+        precision = self.cell_precision(latitude, radius_m)
+        cell = geohash_encode(latitude, longitude, precision)
+        key = (cell, radius_km)
+
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at < time.monotonic():
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            entry = await self._load(key, radius_m, loader)
+        else:
+            self._entries.move_to_end(key)
+            logger.debug(f"Запрос по радиусу обслужен из кэша ячейки {cell}.")
+        if entry.payloads is None:
+            return None
+
+        distances = local_ellipsoid_distance_m(latitude, longitude, entry.latitudes, entry.longitudes)
+        matched = np.flatnonzero(distances <= radius_m)
+        order = np.lexsort((entry.ids[matched], distances[matched]))
+        return [
+            (float(distances[index]), int(entry.ids[index]), entry.payloads[index])
+            for index in matched[order]
+        ]
+
+    async def _load(
+        self,
+        key: tuple[str, int],
+        radius_m: float,
+        loader: Callable[[float, float, float, int], Awaitable[list[tuple[int, float, float, dict]]]],
+    ) -> RadiusCacheEntry:
+        cell, _ = key
+        center_latitude, center_longitude = geohash_cell_center(cell)
+        height, width = geohash_cell_size(len(cell))
+        corner_distance = local_ellipsoid_distance_m(
+            center_latitude,
+            center_longitude,
+            np.array([center_latitude + height / 2, center_latitude - height / 2]),
+            np.array([center_longitude + width / 2, center_longitude + width / 2]),
+        ).max()
+        # Небольшой запас покрывает расхождение локального приближения с расстоянием PostGIS.
+        superset_radius_m = (radius_m + float(corner_distance)) * 1.001 + 1
+
+        version = self.version
+        buildings = await loader(center_latitude, center_longitude, superset_radius_m, self.max_buildings + 1)
+        entry = RadiusCacheEntry(
+            center_latitude,
+            center_longitude,
+            superset_radius_m,
+            buildings if len(buildings) <= self.max_buildings else None,
+            time.monotonic() + self.ttl_seconds,
+        )
+        # Надмножество, загруженное во время записи в здания, могло устареть, поэтому не сохраняется.
+        if version == self.version and self.shared_version == cache_versions.version(BUILDINGS_CACHE):
+            self._entries[key] = entry
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def _drop(self, predicate: Callable[[RadiusCacheEntry], bool]) -> None:
+        self.version += 1
+        for key in [key for key, entry in self._entries.items() if predicate(entry)]:
+            del self._entries[key]
+
+    def invalidate_point(self, latitude: float, longitude: float) -> None:
+        """Сброс записей, в круг которых попадает точка нового, перемещённого или удалённого здания."""
+        self._drop(lambda entry: entry.covers_point(latitude, longitude))
+
+    def invalidate_buildings(self, building_ids: set[Optional[int]]) -> None:
+        """Сброс записей, содержащих изменённые здания или здания, у которых изменились организации."""
+        building_ids = {building_id for building_id in building_ids if building_id is not None}
+        if not building_ids:
+            return
+        self._drop(lambda entry: entry.contains_buildings(building_ids))
+
+    def clear(self) -> None:
+        self.version += 1
+        self._entries.clear()
+
+
+building_radius_cache = BuildingRadiusCache(
+    enabled=settings.radius_cache_enabled,
+    max_entries=settings.radius_cache_max_entries,
+    ttl_seconds=settings.radius_cache_ttl_seconds,
+    max_radius_km=settings.radius_cache_max_radius_km,
+    max_buildings=settings.radius_cache_max_buildings,
+    cell_ratio=settings.radius_cache_cell_ratio,
+)
@@ -1,12 +1,11 @@
 from datetime import datetime
 from decimal import Decimal
-from typing import Optional
+from typing import Annotated, Literal, Optional, Union
 
 from geoalchemy2 import WKBElement
-from geoalchemy2.shape import to_shape
-from pydantic import BaseModel, ConfigDict, field_validator, Field
+from pydantic import BaseModel, ConfigDict, field_validator, model_validator, Field, ValidationInfo
 
-from buildings.validators import fractional_part_validator
+from buildings.validators import fractional_part_validator, geo_point_wkt, validate_polygon_rings
 from organizations.schemas import OrganizationShortDB
 
 
@@ -58,9 +57,12 @@ class BuildingDB(BuildingBase):
     update_date: datetime
 
     @field_validator("geo_point", mode="before")
-    def validate_geo_point(cls, geo_point: WKBElement) -> str:
-        shaped_wkb_element = to_shape(geo_point)
-        return shaped_wkb_element.wkt
+    def validate_geo_point(cls, geo_point: WKBElement, info: ValidationInfo) -> str:
+        return geo_point_wkt(geo_point, info.data.get("latitude"), info.data.get("longitude"))
+
+
+class BuildingWithDistanceDB(BuildingDB):
+    distance_m: float
 
 
 class BuildingShortDB(BuildingBase):
@@ -71,6 +73,40 @@ class BuildingShortDB(BuildingBase):
     update_date: datetime
 
     @field_validator("geo_point", mode="before")
-    def validate_geo_point(cls, geo_point: WKBElement) -> str:
-        shaped_wkb_element = to_shape(geo_point)
-        return shaped_wkb_element.wkt
+    def validate_geo_point(cls, geo_point: WKBElement, info: ValidationInfo) -> str:
+        return geo_point_wkt(geo_point, info.data.get("latitude"), info.data.get("longitude"))
+
+
+Position = tuple[Annotated[float, Field(ge=-180, le=180)], Annotated[float, Field(ge=-90, le=90)]]
+
+
+class GeoJSONPolygon(BaseModel):
+    type: Literal["Polygon", "MultiPolygon"]
+    coordinates: Union[list[list[list[Position]]], list[list[Position]]]
+
+    @model_validator(mode="after")
+    def validate_rings(self) -> "GeoJSONPolygon":
+        validate_polygon_rings([self.coordinates] if self.type == "Polygon" else self.coordinates)
+        return self
+
+
+class BuildingClusterDB(BaseModel):
+    cell: str
+    latitude: float
+    longitude: float
+    buildings_count: int
+    organizations_count: Optional[int] = None
+
+
+class BuildingImportError(BaseModel):
+    row: int
+    error: str
+
+
+class BuildingImportReport(BaseModel):
+    received: int
+    invalid: int
+    imported: int
+    skipped_duplicates: int
+    errors: list[BuildingImportError]
+    aborted: bool
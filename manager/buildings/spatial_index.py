@@ -0,0 +1,168 @@
+import asyncio
+from decimal import Decimal
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import select
+
+from buildings.geo import haversine_m, latitude_delta
+from core.cache_versions import BUILDING_POINTS_CACHE, cache_versions
+from core.config import settings
+from core.db import AsyncSessionLocal
+from core.logger import logger
+from core.models import Building
+
+
+class BuildingSpatialIndex:
+    """
+    Индекс точек зданий в памяти процесса для отбора кандидатов в запросах по радиусу и ближайших зданий.
+    Точки хранятся в массивах NumPy, отсортированных по широте: полоса широт находится бинарным поиском,
+    расстояния внутри полосы считаются векторно. Изменения из BuildingCRUD помечают массивы устаревшими,
+    и они пересобираются при следующем запросе. Индекс помнит версию BUILDING_POINTS_CACHE, с которой
+    загружен: после записи в любом процессе приложения версия расходится, запросы идут в БД без индекса,
+    а фоновая задача перезагружает его не чаще раза в refresh_interval секунд.
+    """
+
+    def __init__(self, enabled: bool, refresh_interval: float):
+        self.enabled = enabled
+        self.refresh_interval = refresh_interval
+        self.loaded = False
+        self.version: Optional[int] = None
+        self._points: dict[int, tuple[float, float]] = {}
+        self._dirty = False
+        self._ids = np.empty(0, dtype=np.int64)
+        self._latitudes = np.empty(0, dtype=np.float64)
+        self._longitudes = np.empty(0, dtype=np.float64)
+        # Изменения из BuildingCRUD во время перезагрузки, применяются к новому снимку после его загрузки.
+        self._pending: Optional[dict[int, Optional[tuple[float, float]]]] = None
+        self._reload_lock = asyncio.Lock()
+        self._stop_event = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_ready(self) -> bool:
+        """Индекс загружен и соответствует последней известной версии точек зданий во всех процессах."""
+        return (
+            self.enabled
+            and self.loaded
+            and self.version is not None
+            and self.version == cache_versions.version(BUILDING_POINTS_CACHE)
+        )
+
+    async def start(self) -> None:
+        if not self.enabled:
+            return
+        await self.reload()
+        self._stop_event.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stop_event.set()
+        await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=self.refresh_interval)
+            except asyncio.TimeoutError:
+                if self.is_ready:
+                    continue
+                try:
+                    await self.reload()
+                except Exception as e:
+                    logger.error(f"Ошибка перезагрузки пространственного индекса зданий: {e}")
+
+    async def reload(self) -> None:
+        """
+        Полная загрузка координат зданий из БД. Версия читается до запроса: запись, закоммиченная после
+        начала загрузки, увеличит её ещё раз, и индекс останется неактуальным до следующей перезагрузки.
+        """
+        async with self._reload_lock:
+            version = cache_versions.version(BUILDING_POINTS_CACHE)
+            self._pending = {}
+            try:
+                async with AsyncSessionLocal() as session:
+                    result = await session.execute(
+                        select(Building.id, Building.latitude, Building.longitude)
+                    )
+                    points = {
+                        building_id: (float(latitude), float(longitude))
+                        for building_id, latitude, longitude in result.all()
+                    }
+                for building_id, point in self._pending.items():
+                    if point is None:
+                        points.pop(building_id, None)
+                    else:
+                        points[building_id] = point
+            finally:
+                self._pending = None
+            self._points = points
+            self._dirty = True
+            self.loaded = True
+            self.version = version
+        logger.debug(f"Пространственный индекс зданий загружен, точек: {len(self._points)}.")
+
+    def _apply(self, building_id: int, point: Optional[tuple[float, float]]) -> None:
+        if not self.enabled:
+            return
+        if self._pending is not None:
+            self._pending[building_id] = point
+        if not self.loaded:
+            return
+        if point is not None:
+            self._points[building_id] = point
+            self._dirty = True
+        elif self._points.pop(building_id, None) is not None:
+            self._dirty = True
+
+    def upsert(self, building_id: int, latitude: Decimal, longitude: Decimal) -> None:
+        self._apply(building_id, (float(latitude), float(longitude)))
+
+    def remove(self, building_id: int) -> None:
+        self._apply(building_id, None)
+
+    def _rebuild(self) -> None:
+        if not self._dirty:
+            return
+        ids = np.fromiter(self._points.keys(), dtype=np.int64, count=len(self._points))
+        coordinates = np.array(list(self._points.values()), dtype=np.float64).reshape(-1, 2)
+        order = np.argsort(coordinates[:, 0], kind="stable")
+        self._ids = ids[order]
+        self._latitudes = coordinates[order, 0]
+        self._longitudes = coordinates[order, 1]
+        self._dirty = False
+
+    def query_radius(self, latitude: float, longitude: float, radius_m: float) -> list[int]:
+        """Id зданий в радиусе radius_m метров от точки."""
+        self._rebuild()
+        delta = latitude_delta(radius_m)
+        start = np.searchsorted(self._latitudes, latitude - delta, side="left")
+        end = np.searchsorted(self._latitudes, latitude + delta, side="right")
+        if start == end:
+            return []
+        distances = haversine_m(
+            latitude, longitude, self._latitudes[start:end], self._longitudes[start:end]
+        )
+        return self._ids[start:end][distances <= radius_m].tolist()
+
+    def nearest(self, latitude: float, longitude: float, count: int) -> list[int]:
+        """Id count ближайших к точке зданий в порядке возрастания расстояния."""
+        self._rebuild()
+        if count <= 0 or not self._ids.size:
+            return []
+        distances = haversine_m(latitude, longitude, self._latitudes, self._longitudes)
+        if count < distances.size:
+            candidates = np.argpartition(distances, count - 1)[:count]
+        else:
+            candidates = np.arange(distances.size)
+        candidates = candidates[np.argsort(distances[candidates], kind="stable")]
+        return self._ids[candidates].tolist()
+
+
+building_spatial_index = BuildingSpatialIndex(
+    enabled=settings.spatial_index_enabled,
+    refresh_interval=settings.spatial_index_refresh_seconds,
+)
@@ -1,6 +1,50 @@
 from decimal import Decimal
+from typing import Any, Optional
+
+from geoalchemy2.shape import to_shape
+from shapely.geometry import shape
+from shapely.validation import explain_validity
 
 
 def fractional_part_validator(v: Decimal) -> None:
     if len(str(v).split(".")[-1]) > 6:
         raise ValueError("Числа с точностью больше 6 знаков не принимаются.")
+
+
+def format_coordinate(v: Decimal) -> str:
+    """Координата в том же виде, в котором её выводит shapely в WKT: без лишних нулей и экспоненты."""
+    return format(Decimal(str(v)).normalize(), "f")
+
+
+def geo_point_wkt(geo_point: Any, latitude: Optional[Decimal], longitude: Optional[Decimal]) -> str:
+    """
+    WKT точки здания. Точка строится из уже загруженных широты и долготы без разбора WKB,
+    shapely используется только если координат нет среди данных модели.
+    """
+    if latitude is not None and longitude is not None:
+        return f"POINT ({format_coordinate(longitude)} {format_coordinate(latitude)})"
+    if isinstance(geo_point, str):
+        return geo_point
+    return to_shape(geo_point).wkt
+
+
+def validate_polygon_rings(polygons: list[list[list[tuple[float, float]]]]) -> None:
+    """Кольца полигонов GeoJSON: не меньше 4 точек, первая и последняя точки совпадают."""
+    if not polygons:
+        raise ValueError("Геометрия должна содержать хотя бы один полигон.")
+    for polygon in polygons:
+        if not polygon:
+            raise ValueError("Полигон должен содержать хотя бы одно кольцо.")
+        for ring in polygon:
+            if not all(isinstance(position, tuple) for position in ring):
+                raise ValueError("Вложенность координат не соответствует типу геометрии.")
+            if len(ring) < 4:
+                raise ValueError("Кольцо полигона должно содержать не меньше 4 точек.")
+            if ring[0] != ring[-1]:
+                raise ValueError("Кольцо полигона должно быть замкнуто: первая и последняя точки совпадают.")
+
+
+def polygon_validity_error(geojson: dict) -> Optional[str]:
+    """Причина некорректности полигона (самопересечение, дыра вне оболочки и т.п.) или None для корректного."""
+    geometry = shape(geojson)
+    return None if geometry.is_valid else explain_validity(geometry)
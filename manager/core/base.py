@@ -4,6 +4,8 @@ from .models import (  # noqa
     organization_activity,  # noqa
     Building,  # noqa
     activity_hierarchy,  # noqa
+    activity_closure,  # noqa
     Activity,  # noqa
     Organization,  # noqa
+    ElasticOutbox,  # noqa
 )  # noqa
@@ -0,0 +1,109 @@
+import asyncio
+from collections import Counter
+from typing import Optional
+
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.engine import URL
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import settings
+from .db import async_engine
+from .logger import logger
+
+ACTIVITY_TREE_CACHE = "activities"
+TILES_CACHE = "tiles"
+BUILDING_POINTS_CACHE = "building_points"
+BUILDINGS_CACHE = "buildings"
+CACHE_INVALIDATION_CHANNEL = "cache_invalidation"
+
+# Тот же запрос для транзакций на соединении asyncpg без сессии SQLAlchemy, например массовой загрузки зданий.
+BUMP_CACHE_VERSIONS = f"SELECT pg_notify('{CACHE_INVALIDATION_CHANNEL}', name) FROM unnest($1::text[]) AS name"
+
+
+async def bump_cache_versions(session: AsyncSession, *names: str) -> None:
+    """
+    Уведомление всех процессов приложения об изменении данных кэшей в транзакции записи, перед коммитом.
+    PostgreSQL доставляет NOTIFY только после коммита и не блокирует строк, поэтому параллельные
+    транзакции записи не ждут друг друга. Повторы одного имени в транзакции сворачиваются в одно уведомление.
+    """
+    await session.execute(
+        text(f"SELECT pg_notify('{CACHE_INVALIDATION_CHANNEL}', name) FROM unnest(CAST(:names AS text[])) AS name"),
+        {"names": sorted(set(names))},
+    )
+
+
+class CacheVersions:
+    """
+    Версии кэшей внутри процесса. Фоновая задача держит отдельное соединение с LISTEN на канал
+    CACHE_INVALIDATION_CHANNEL и увеличивает версию кэша при каждом уведомлении, поэтому чтение версии
+    не обращается к БД. Пока соединение не установлено, уведомления могут теряться: версия не выдаётся,
+    и кэши читают БД напрямую. После переподключения увеличиваются версии всех кэшей.
+    """
+
+    def __init__(self, url: URL, check_interval: float):
+        self.url = url
+        self.check_interval = check_interval
+        self._generation = 0
+        self._notifications: Counter[str] = Counter()
+        self._listening = False
+        self._stop_event = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def version(self, name: str) -> Optional[int]:
+        """Текущая версия кэша или None, если уведомления сейчас не принимаются и кэшу доверять нельзя."""
+        if not self._listening:
+            return None
+        return self._generation + self._notifications[name]
+
+    def _on_notification(self, connection, pid, channel, payload) -> None:
+        self._notifications[payload] += 1
+
+    async def start(self) -> None:
+        self._stop_event.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._stop_event.set()
+            await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                await self._listen()
+            except Exception as e:
+                logger.error(f"Соединение для уведомлений об изменении кэшей потеряно, кэши отключены: {e}")
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=self.check_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _listen(self) -> None:
+        connection = await asyncpg.connect(
+            host=self.url.host,
+            port=self.url.port,
+            user=self.url.username,
+            password=self.url.password,
+            database=self.url.database,
+            timeout=self.check_interval,
+        )
+        try:
+            await connection.add_listener(CACHE_INVALIDATION_CHANNEL, self._on_notification)
+            # Изменения, сделанные пока соединения не было, неизвестны, поэтому все прежние версии устаревают.
+            self._generation += 1
+            self._listening = True
+            logger.debug("Подписка на уведомления об изменении кэшей установлена.")
+            while not self._stop_event.is_set():
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), timeout=self.check_interval)
+                except asyncio.TimeoutError:
+                    # Проверка соединения: обрыв сети без закрытия сокета иначе остался бы незамеченным.
+                    await connection.execute("SELECT 1", timeout=self.check_interval)
+        finally:
+            self._listening = False
+            connection.terminate()
+
+
+cache_versions = CacheVersions(url=async_engine.url, check_interval=settings.cache_versions_check_interval)
@@ -13,17 +13,60 @@ class Settings(BaseSettings):
     db_host: str
     db_port: int
     database_url: str = None
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    db_pool_timeout: float = 30.0
+    db_replica_urls: list[str] = []
+    db_replica_max_lag_seconds: float = 5.0
+    db_replica_health_interval: float = 10.0
+    db_sticky_primary_seconds: float = 10.0
+    cache_versions_check_interval: float = 5.0
 
     line_provider_token: str = (
         "f3fb8928bad49887d2089f5ad04c2cb634bb1980db77fc8c3b111edad34f4eb7"
     )
 
+    default_page_size: int = 100
+    max_page_size: int = 1000
+    export_chunk_size: int = 1000
+    import_error_sample_size: int = 100
+
     meter_coefficient: int = 1000
+    max_radius_km: int = 100
+    cluster_cells_per_tile: int = 8
+    tile_cache_size: int = 2048
+    tile_extent: int = 4096
+    tile_buffer: int = 64
+    tile_max_zoom: int = 22
+    spatial_index_enabled: bool = False
+    spatial_index_refresh_seconds: float = 10.0
+    radius_cache_enabled: bool = True
+    radius_cache_max_entries: int = 1024
+    radius_cache_ttl_seconds: float = 60.0
+    radius_cache_max_radius_km: int = 20
+    radius_cache_max_buildings: int = 5000
+    radius_cache_cell_ratio: float = 0.15
     wsg_standard: int = 4326
 
     es_address: str
+    es_index_alias: str = "organizations"
+    es_outbox_batch_size: int = 500
+    es_outbox_poll_interval: float = 1.0
+    es_outbox_retry_delay: float = 5.0
+    es_outbox_max_attempts: int = 10
+    es_outbox_retention_seconds: int = 86400
+    es_reindex_chunk_size: int = 1000
+    es_reindex_concurrency: int = 4
+    es_reindex_catchup_margin_seconds: int = 60
 
     log_level: str = "INFO"
+    sql_n_plus_one_threshold: int = 10
+    slow_query_threshold_ms: float = 200.0
+    slow_query_explain_sample_rate: float = 0.0
+    slow_query_explain_timeout: float = 10.0
+    slow_query_buffer_size: int = 100
 
 
 settings = Settings()
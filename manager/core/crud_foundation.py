@@ -1,9 +1,13 @@
+from typing import Optional
+
 from fastapi import HTTPException, status
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from .pagination import decode_cursor, encode_cursor, is_cursor_integer
+
 
 class CRUDBase:
 
@@ -20,10 +24,38 @@ class CRUDBase:
         )
         return db_obj.scalars().first()
 
-    async def get_multi(self, session: AsyncSession):
-        db_objs = await session.execute(select(self.model))
+    async def get_multi(
+        self,
+        session: AsyncSession,
+        limit: Optional[int] = None,
+        after_id: Optional[int] = None,
+    ):
+        query = select(self.model).order_by(self.model.id)
+        if after_id is not None:
+            query = query.where(self.model.id > after_id)
+        if limit is not None:
+            query = query.limit(limit)
+        db_objs = await session.execute(query)
         return db_objs.scalars().all()
 
+    async def get_page(
+        self,
+        session: AsyncSession,
+        limit: int,
+        after: Optional[str] = None,
+    ) -> dict:
+        """Страница объектов с выборкой по ключу id: запрашивается limit + 1 строк для определения следующей страницы."""
+        after_id = decode_cursor(after)[0] if after else None
+        if after_id is not None and not is_cursor_integer(after_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Некорректный курсор постраничной выборки.",
+            )
+        db_objs = await self.get_multi(session, limit=limit + 1, after_id=after_id)
+        items = db_objs[:limit]
+        next_cursor = encode_cursor(items[-1].id) if len(db_objs) > limit else None
+        return {"items": items, "next_cursor": next_cursor}
+
     async def handle_integrity_error(self, e: IntegrityError):
         """Обрабатывает ошибки IntegrityError при работе с базой данных."""
         error_message = str(e.orig)
@@ -5,6 +5,9 @@ from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 from sqlalchemy.sql import func
 
 from .config import settings
+from .pool import InstrumentedAsyncQueuePool
+from .slow_queries import slow_query_log
+from .sql_stats import add_statement_observer, instrument_engine
 
 
 class Base(DeclarativeBase):
@@ -28,7 +31,18 @@ database_url = URL.create(
     database=settings.db_name,
 )
 
-async_engine = create_async_engine(database_url, future=True)
+async_engine = create_async_engine(
+    database_url,
+    future=True,
+    poolclass=InstrumentedAsyncQueuePool,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_recycle=settings.db_pool_recycle,
+    pool_pre_ping=settings.db_pool_pre_ping,
+    pool_timeout=settings.db_pool_timeout,
+)
+add_statement_observer(slow_query_log.record)
+instrument_engine(async_engine)
 
 AsyncSessionLocal = async_sessionmaker(
     bind=async_engine, autoflush=False, expire_on_commit=False, autocommit=False
@@ -5,6 +5,7 @@ import time
 from fastapi import Request
 
 from core.config import settings
+from core.sql_stats import RequestSqlStats, current_sql_stats, preview_statement
 
 logger = logging.getLogger("Organization_manager_logger")
 
@@ -21,13 +22,35 @@ logger.setLevel(getattr(logging, settings.log_level, logging.INFO))
 
 async def request_log(request: Request, call_next):
     start_time = time.time()
-    response = await call_next(request)
+    sql_stats = RequestSqlStats()
+    token = current_sql_stats.set(sql_stats)
+    try:
+        response = await call_next(request)
+    finally:
+        current_sql_stats.reset(token)
     process_time = time.time() - start_time
     log_data = {
         "method": request.method,
         "path": request.url.path,
         "process_time": str(process_time),
         "status_code": response.status_code,
+        "db_queries": sql_stats.query_count,
+        "db_time": str(sql_stats.total_seconds),
+        "db_slowest_time": str(sql_stats.slowest_seconds),
     }
+    if sql_stats.slowest_statement is not None:
+        log_data["db_slowest_statement"] = preview_statement(sql_stats.slowest_statement)
     logger.info(log_data)
+
+    statement, repeats = sql_stats.most_repeated()
+    if repeats >= settings.sql_n_plus_one_threshold:
+        logger.warning(
+            f"Возможная проблема N+1 в {request.method} {request.url.path}: "
+            f"запрос выполнен {repeats} раз: {preview_statement(statement)}"
+        )
+    # Для потоковых ответов учитываются только запросы, выполненные до отправки заголовков.
+    response.headers["Server-Timing"] = (
+        f'db;dur={sql_stats.total_seconds * 1000:.1f};desc="{sql_stats.query_count} queries", '
+        f"app;dur={process_time * 1000:.1f}"
+    )
     return response
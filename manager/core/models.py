@@ -1,18 +1,25 @@
+from datetime import datetime
 from decimal import Decimal
 from typing import Optional
 
 from geoalchemy2 import Geography
 from sqlalchemy import (
+    BigInteger,
     Integer,
     String,
+    Text,
+    TIMESTAMP,
     ForeignKey,
     Table,
     Column,
     Numeric,
     UniqueConstraint,
+    Index,
+    text,
 )
 from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.sql import func
 
 from .db import Base
 
@@ -25,6 +32,7 @@ organization_activity = Table(
     UniqueConstraint(
         "organization_id", "activity_id", name="idx_unique_organization_activity"
     ),
+    Index("ix_organization_activities_activity_id", "activity_id"),
 )
 
 
@@ -55,6 +63,17 @@ activity_hierarchy = Table(
     UniqueConstraint(
         "parent_id", "child_id", name="idx_unique_parent_child"
     ),
+    Index("ix_activity_hierarchy_child_id", "child_id"),
+)
+
+
+activity_closure = Table(
+    "activity_closure",
+    Base.metadata,
+    Column("ancestor_id", ForeignKey("activities.id", ondelete="CASCADE"), primary_key=True),
+    Column("descendant_id", ForeignKey("activities.id", ondelete="CASCADE"), primary_key=True),
+    Column("depth", Integer, nullable=False, comment="Расстояние от предка до потомка"),
+    Index("ix_activity_closure_descendant_id", "descendant_id"),
 )
 
 
@@ -94,7 +113,8 @@ class Organization(Base):
     building_id: Mapped[Optional[Integer]] = mapped_column(
         ForeignKey("buildings.id", ondelete="SET NULL"),
         comment="Строение в котором находится организация",
-        nullable=True
+        nullable=True,
+        index=True,
     )
     building = relationship('Building', back_populates='organizations')
     activities = relationship(
@@ -102,3 +122,33 @@ class Organization(Base):
         secondary=organization_activity,
         back_populates='organizations',
     )
+
+
+class ElasticOutbox(Base):
+    __tablename__ = 'elastic_outbox'
+    __table_args__ = (
+        Index(
+            "ix_elastic_outbox_pending",
+            "next_attempt_at",
+            "id",
+            postgresql_where=text("processed_at IS NULL"),
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    organization_id: Mapped[int] = mapped_column(
+        Integer, comment="Организация, изменения которой нужно передать в Elastic Search", nullable=False
+    )
+    operation: Mapped[str] = mapped_column(
+        String(16), comment="Операция над документом: index или delete", nullable=False
+    )
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True), nullable=False, default=func.now(), server_default=func.now()
+    )
+    processed_at: Mapped[Optional[datetime]] = mapped_column(TIMESTAMP(timezone=True), nullable=True)
+    failed_at: Mapped[Optional[datetime]] = mapped_column(
+        TIMESTAMP(timezone=True), comment="Время перевода записи в dead-letter после исчерпания попыток", nullable=True
+    )
+
@@ -0,0 +1,59 @@
+import base64
+import json
+import math
+from typing import Any, Generic, Optional, TypeVar
+
+from fastapi import HTTPException, Query, status
+from pydantic import BaseModel
+
+from .config import settings
+
+ItemType = TypeVar("ItemType")
+
+
+class Page(BaseModel, Generic[ItemType]):
+    items: list[ItemType]
+    next_cursor: Optional[str] = None
+
+
+class PaginationParams:
+    """Параметры постраничной выборки по ключу: размер страницы и курсор последнего полученного элемента."""
+
+    def __init__(
+        self,
+        limit: int = Query(settings.default_page_size, ge=1, le=settings.max_page_size),
+        after: Optional[str] = Query(None, description="Курсор из поля next_cursor предыдущей страницы"),
+    ):
+        self.limit = limit
+        self.after = after
+
+
+def encode_cursor(*values: Any) -> str:
+    """Упаковка ключа последнего элемента страницы в непрозрачный курсор."""
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def is_cursor_integer(value: Any) -> bool:
+    """Целое значение ключа из курсора. bool - подкласс int, поэтому true/false отклоняются явно."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def is_cursor_number(value: Any) -> bool:
+    """Конечное числовое значение ключа из курсора, без bool, NaN и бесконечностей."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def decode_cursor(cursor: str, size: int = 1) -> list:
+    """Распаковка курсора, полученного от клиента, в список значений ключа."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор постраничной выборки.",
+        )
+    return values
@@ -0,0 +1,79 @@
+import time
+from bisect import bisect_left
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Границы корзин гистограммы ожидания соединения в секундах.
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class PoolStatistics:
+    """Счётчики выдачи соединений из пула и гистограмма времени ожидания."""
+
+    def __init__(self, buckets: tuple[float, ...] = WAIT_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_sum = 0.0
+        self.wait_seconds_max = 0.0
+
+    def observe(self, wait_seconds: float) -> None:
+        self.checkouts += 1
+        self.bucket_counts[bisect_left(self.buckets, wait_seconds)] += 1
+        self.wait_seconds_sum += wait_seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+
+    def observe_timeout(self, wait_seconds: float) -> None:
+        self.timeouts += 1
+        self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+
+    def as_dict(self) -> dict:
+        histogram = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.bucket_counts):
+            cumulative += count
+            histogram.append({"le": bound, "count": cumulative})
+        return {
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_seconds_sum": self.wait_seconds_sum,
+            "wait_seconds_max": self.wait_seconds_max,
+            "wait_seconds_histogram": histogram,
+        }
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений, замеряющий время ожидания свободного соединения при каждой выдаче."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.statistics = PoolStatistics()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.statistics.observe_timeout(time.perf_counter() - started)
+            raise
+        self.statistics.observe(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.statistics = self.statistics
+        return pool
+
+
+def pool_status(pool: InstrumentedAsyncQueuePool) -> dict:
+    """Текущее состояние пула и накопленная статистика ожидания."""
+    return {
+        "size": pool.size(),
+        "max_overflow": pool._max_overflow,
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        **pool.statistics.as_dict(),
+    }
@@ -0,0 +1,270 @@
+import asyncio
+import itertools
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+import asyncpg
+from fastapi import Request, Response
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+
+from .config import settings
+from .db import AsyncSessionLocal
+from .logger import logger
+from .pool import InstrumentedAsyncQueuePool
+from .sql_stats import instrument_engine
+
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+STICKY_COOKIE = "db_primary_until"
+
+# Отставание реплики: ноль, если всё полученное WAL уже применено, иначе время с последней применённой транзакции.
+REPLICA_LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+
+CONNECTION_ERRORS = (OSError, asyncpg.PostgresConnectionError, asyncpg.InterfaceError)
+
+
+class ReplicaRequestState:
+    """Состояние HTTP запроса для маршрутизации: была ли ошибка соединения с репликой и нужно ли читать из основной БД."""
+
+    __slots__ = ("replica_failed", "force_primary")
+
+    def __init__(self, force_primary: bool = False):
+        self.replica_failed = False
+        self.force_primary = force_primary
+
+
+current_replica_state: ContextVar[Optional[ReplicaRequestState]] = ContextVar("current_replica_state", default=None)
+
+
+def is_connection_failure(error: Optional[BaseException]) -> bool:
+    while error is not None:
+        if isinstance(error, CONNECTION_ERRORS):
+            return True
+        error = error.__cause__
+    return False
+
+
+class Replica:
+    """Реплика БД со своим пулом соединений и последним известным состоянием."""
+
+    def __init__(self, name: str, engine: AsyncEngine):
+        self.name = name
+        self.engine = engine
+        self.session_factory = async_sessionmaker(
+            bind=engine, autoflush=False, expire_on_commit=False, autocommit=False
+        )
+        instrument_engine(engine)
+        event.listen(engine.sync_engine, "handle_error", self.handle_error)
+        self.healthy = False
+        self.lag_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def handle_error(self, exception_context) -> None:
+        """
+        Ошибки соединения с репликой отмечаются на уровне движка: здесь они видны до того, как эндпоинт
+        превратит их в HTTPException, и в том числе для потоковых ответов.
+        """
+        if exception_context.is_disconnect or is_connection_failure(exception_context.original_exception):
+            replica_router.mark_failed(self, exception_context.original_exception)
+            state = current_replica_state.get()
+            if state is not None:
+                state.replica_failed = True
+
+    def status(self) -> dict:
+        return {
+            "healthy": self.healthy,
+            "lag_seconds": self.lag_seconds,
+            "last_error": self.last_error,
+        }
+
+
+class ReplicaRouter:
+    """
+    Выбор реплики для чтения. Реплики проверяются фоновой задачей: недоступная реплика или реплика
+    с отставанием больше max_lag_seconds не получает запросы, пока проверка не пройдёт снова.
+    """
+
+    def __init__(self, urls: list[str], max_lag_seconds: float, health_interval: float):
+        self.max_lag_seconds = max_lag_seconds
+        self.health_interval = health_interval
+        self.replicas = [
+            Replica(
+                f"replica-{number}",
+                create_async_engine(
+                    url,
+                    future=True,
+                    poolclass=InstrumentedAsyncQueuePool,
+                    pool_size=settings.db_pool_size,
+                    max_overflow=settings.db_max_overflow,
+                    pool_recycle=settings.db_pool_recycle,
+                    pool_pre_ping=settings.db_pool_pre_ping,
+                    pool_timeout=settings.db_pool_timeout,
+                ),
+            )
+            for number, url in enumerate(urls)
+        ]
+        self._round_robin = itertools.cycle(self.replicas) if self.replicas else None
+        self._stop_event = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if not self.replicas:
+            return
+        await self.check_replicas()
+        self._stop_event.clear()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._stop_event.set()
+            await self._task
+            self._task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    async def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=self.health_interval)
+            except asyncio.TimeoutError:
+                await self.check_replicas()
+
+    async def check_replica(self, replica: Replica) -> None:
+        try:
+            async with replica.engine.connect() as connection:
+                lag_seconds = float((await connection.execute(REPLICA_LAG_QUERY)).scalar())
+        except Exception as e:
+            self.mark_failed(replica, e)
+            return
+        replica.lag_seconds = lag_seconds
+        replica.last_error = None
+        healthy = lag_seconds <= self.max_lag_seconds
+        if healthy != replica.healthy:
+            logger.info(f"Реплика {replica.name} {'доступна' if healthy else 'отстаёт'}, отставание {lag_seconds} с.")
+        replica.healthy = healthy
+
+    async def check_replicas(self) -> None:
+        await asyncio.gather(*(self.check_replica(replica) for replica in self.replicas))
+
+    def mark_failed(self, replica: Replica, error: Exception) -> None:
+        if replica.healthy:
+            logger.error(f"Реплика {replica.name} недоступна, чтение переключено на основную БД: {error}")
+        replica.healthy = False
+        replica.last_error = str(error)
+
+    def choose(self) -> Optional[Replica]:
+        """Следующая по кругу исправная реплика или None, если читать нужно из основной БД."""
+        for _ in range(len(self.replicas)):
+            replica = next(self._round_robin)
+            if replica.healthy:
+                return replica
+        return None
+
+
+replica_router = ReplicaRouter(
+    urls=settings.db_replica_urls,
+    max_lag_seconds=settings.db_replica_max_lag_seconds,
+    health_interval=settings.db_replica_health_interval,
+)
+
+
+def is_sticky_to_primary(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def stick_to_primary(response: Response) -> None:
+    """Cookie, направляющая чтения клиента в основную БД на время, за которое реплики догоняют запись."""
+    if not replica_router.replicas:
+        return
+    sticky_seconds = settings.db_sticky_primary_seconds
+    response.set_cookie(
+        STICKY_COOKIE,
+        str(time.time() + sticky_seconds),
+        max_age=int(sticky_seconds) + 1,
+        httponly=True,
+    )
+
+
+def must_read_primary(request: Request) -> bool:
+    state = current_replica_state.get()
+    return is_sticky_to_primary(request) or (state is not None and state.force_primary)
+
+
+def read_session_factory(request: Request) -> async_sessionmaker:
+    """Фабрика сессий для чтения вне зависимостей FastAPI, например в потоковых ответах."""
+    replica = None if must_read_primary(request) else replica_router.choose()
+    return replica.session_factory if replica is not None else AsyncSessionLocal
+
+
+async def get_routed_session(request: Request, response: Response):
+    """
+    Сессия БД с маршрутизацией: запросы на чтение уходят на реплику, запросы на запись - в основную БД.
+    После записи клиент получает cookie, и его чтения идут в основную БД, пока реплики не догонят запись.
+    """
+    if request.method in READ_METHODS:
+        async with read_session_factory(request)() as session:
+            yield session
+        return
+    stick_to_primary(response)
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+class ReplicaFallbackMiddleware:
+    """
+    Повтор идемпотентных запросов в основной БД. Если во время GET запроса соединение с репликой оборвалось
+    и ответ ещё не начал отправляться, ответ с ошибкой отбрасывается и запрос один раз выполняется заново
+    с чтением из основной БД.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in READ_METHODS or not replica_router.replicas:
+            await self.app(scope, receive, send)
+            return
+
+        state = ReplicaRequestState()
+        response_started = False
+        response_discarded = False
+
+        async def send_unless_failed(message):
+            nonlocal response_started, response_discarded
+            if message["type"] == "http.response.start":
+                if state.replica_failed and message["status"] >= 500:
+                    response_discarded = True
+                else:
+                    response_started = True
+            if not response_discarded:
+                await send(message)
+
+        token = current_replica_state.set(state)
+        try:
+            await self.app(scope, receive, send_unless_failed)
+        except Exception:
+            if not state.replica_failed or response_started:
+                raise
+            response_discarded = True
+        finally:
+            current_replica_state.reset(token)
+        if not response_discarded:
+            return
+
+        logger.warning(f"Запрос {scope['path']} повторяется в основной БД после ошибки соединения с репликой.")
+        token = current_replica_state.set(ReplicaRequestState(force_primary=True))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_replica_state.reset(token)
@@ -0,0 +1,124 @@
+import asyncio
+import hashlib
+import random
+import re
+from collections import deque
+from datetime import datetime, timezone
+from typing import Optional
+
+import asyncpg
+from sqlalchemy.engine import URL
+
+from .config import settings
+from .logger import logger
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?")
+PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\$\d+|\?)(?:\s*,\s*(?:\$\d+|\?))+\s*\)")
+WRITE_KEYWORDS = re.compile(r"\b(?:INSERT|UPDATE|DELETE|MERGE|TRUNCATE|CREATE|ALTER|DROP)\b", re.IGNORECASE)
+
+
+def normalize_statement(statement: str) -> str:
+    """SQL без литералов и с одним пробелом между словами, чтобы одинаковые запросы группировались."""
+    statement = " ".join(statement.split())
+    statement = STRING_LITERAL.sub("?", statement)
+    statement = NUMBER_LITERAL.sub("?", statement)
+    return PLACEHOLDER_LIST.sub("(...)", statement)
+
+
+def parameters_fingerprint(parameters) -> str:
+    """Короткий отпечаток параметров: повторы с одинаковыми значениями видны без записи самих значений в лог."""
+    return hashlib.sha1(repr(parameters).encode()).hexdigest()[:12]
+
+
+def is_read_only(statement: str) -> bool:
+    """EXPLAIN ANALYZE выполняет запрос, поэтому повторяются только запросы на чтение без блокировок строк."""
+    return statement.lstrip().upper().startswith(("SELECT", "WITH")) and not WRITE_KEYWORDS.search(statement)
+
+
+class SlowQueryLog:
+    """
+    Журнал медленных запросов. Запросы дольше порога пишутся в лог и в кольцевой буфер,
+    часть запросов на чтение повторяется под EXPLAIN (ANALYZE, BUFFERS) на отдельном соединении
+    в откатываемой транзакции, и план сохраняется вместе с записью.
+    """
+
+    def __init__(self, threshold_ms: float, explain_sample_rate: float, buffer_size: int, explain_timeout: float):
+        self.threshold_ms = threshold_ms
+        self.explain_sample_rate = explain_sample_rate
+        self.explain_timeout = explain_timeout
+        self.entries: deque[dict] = deque(maxlen=buffer_size)
+        self._explain_task: Optional[asyncio.Task] = None
+
+    def record(self, conn, statement, parameters, executemany, duration_ms: float) -> None:
+        if duration_ms < self.threshold_ms:
+            return
+        entry = {
+            "time": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": round(duration_ms, 3),
+            "statement": normalize_statement(statement),
+            "parameters_fingerprint": parameters_fingerprint(parameters),
+            "plan": None,
+            "explain_error": None,
+        }
+        self.entries.append(entry)
+        logger.warning(
+            f"Медленный запрос {entry['duration_ms']} мс [{entry['parameters_fingerprint']}]: {entry['statement']}"
+        )
+        if (
+            not executemany
+            and isinstance(parameters, (tuple, list))
+            and self.explain_sample_rate > 0
+            and random.random() < self.explain_sample_rate
+            and is_read_only(statement)
+            and (self._explain_task is None or self._explain_task.done())
+        ):
+            # Обработчик вызывается внутри greenlet SQLAlchemy в потоке цикла событий, поэтому задачу можно поставить сразу.
+            self._explain_task = asyncio.get_running_loop().create_task(
+                self.explain(entry, conn.engine.url, statement, tuple(parameters))
+            )
+
+    async def explain(self, entry: dict, url: URL, statement: str, parameters: tuple) -> None:
+        """
+        Повтор запроса под EXPLAIN на отдельном соединении с той же БД (основной или репликой),
+        чтобы не занимать пул приложения.
+        """
+        try:
+            connection = await asyncpg.connect(
+                host=url.host,
+                port=url.port,
+                user=url.username,
+                password=url.password,
+                database=url.database,
+                timeout=self.explain_timeout,
+            )
+        except Exception as e:
+            entry["explain_error"] = str(e)
+            return
+        try:
+            transaction = connection.transaction()
+            await transaction.start()
+            try:
+                await connection.execute(f"SET LOCAL statement_timeout = {int(self.explain_timeout * 1000)}")
+                rows = await connection.fetch(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", *parameters)
+                entry["plan"] = "\n".join(row[0] for row in rows)
+            finally:
+                await transaction.rollback()
+        except Exception as e:
+            entry["explain_error"] = str(e)
+        finally:
+            await connection.close()
+
+    def recent(self, limit: int) -> list[dict]:
+        return list(self.entries)[-limit:][::-1]
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+
+slow_query_log = SlowQueryLog(
+    threshold_ms=settings.slow_query_threshold_ms,
+    explain_sample_rate=settings.slow_query_explain_sample_rate,
+    buffer_size=settings.slow_query_buffer_size,
+    explain_timeout=settings.slow_query_explain_timeout,
+)
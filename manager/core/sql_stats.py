@@ -0,0 +1,86 @@
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+STATEMENT_PREVIEW_LENGTH = 300
+
+
+class RequestSqlStats:
+    """Статистика SQL запросов, выполненных в рамках одного HTTP запроса."""
+
+    __slots__ = ("query_count", "total_seconds", "slowest_seconds", "slowest_statement", "statement_counts")
+
+    def __init__(self):
+        self.query_count = 0
+        self.total_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement: Optional[str] = None
+        self.statement_counts: Counter[str] = Counter()
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.query_count += 1
+        self.total_seconds += seconds
+        self.statement_counts[statement] += 1
+        if seconds >= self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = statement
+
+    def most_repeated(self) -> tuple[Optional[str], int]:
+        """Чаще всего повторявшийся запрос: много одинаковых запросов за один HTTP запрос - признак N+1."""
+        if not self.statement_counts:
+            return None, 0
+        return self.statement_counts.most_common(1)[0]
+
+
+current_sql_stats: ContextVar[Optional[RequestSqlStats]] = ContextVar("current_sql_stats", default=None)
+
+# Обработчики, получающие каждый выполненный запрос вместе с уже измеренным временем выполнения в мс.
+statement_observers: list[Callable] = []
+
+
+def add_statement_observer(observer: Callable) -> None:
+    """Подписка на выполненные запросы: observer(conn, statement, parameters, executemany, duration_ms)."""
+    if observer not in statement_observers:
+        statement_observers.append(observer)
+
+
+def preview_statement(statement: str) -> str:
+    statement = " ".join(statement.split())
+    if len(statement) > STATEMENT_PREVIEW_LENGTH:
+        return statement[:STATEMENT_PREVIEW_LENGTH] + "..."
+    return statement
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["query_start_time"].pop()
+    stats = current_sql_stats.get()
+    if stats is not None:
+        stats.record(statement, seconds)
+    for observer in statement_observers:
+        observer(conn, statement, parameters, executemany, seconds * 1000)
+
+
+def handle_error(exception_context):
+    # При ошибке after_cursor_execute не вызывается, время начала снимается со стека здесь.
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start_time"):
+        conn.info["query_start_time"].pop()
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """
+    Подписка на события выполнения запросов движка. Контекст asyncio передаётся в greenlet SQLAlchemy,
+    поэтому запросы попадают в статистику того HTTP запроса, в рамках которого выполнены.
+    Время каждого запроса измеряется один раз и передаётся также в statement_observers.
+    """
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine.sync_engine, "handle_error", handle_error)
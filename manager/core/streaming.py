@@ -0,0 +1,57 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, AsyncIterator, Iterable
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Тип {type(value).__name__} не сериализуется в JSON")
+
+
+def dump_json_line(row: dict) -> str:
+    return json.dumps(row, ensure_ascii=False, default=_json_default) + "\n"
+
+
+async def ndjson_chunks(rows: AsyncIterator[dict], chunk_size: int) -> AsyncIterator[bytes]:
+    """Сериализация потока строк в NDJSON, строки отдаются пачками по chunk_size."""
+    buffer = []
+    async for row in rows:
+        buffer.append(dump_json_line(row))
+        if len(buffer) >= chunk_size:
+            yield "".join(buffer).encode()
+            buffer.clear()
+    if buffer:
+        yield "".join(buffer).encode()
+
+
+async def csv_chunks(
+    rows: AsyncIterator[dict], fieldnames: Iterable[str], chunk_size: int
+) -> AsyncIterator[bytes]:
+    """Сериализация потока строк в CSV, списки записываются в ячейку в виде JSON массива."""
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=list(fieldnames), extrasaction="ignore")
+    writer.writeheader()
+    written = 0
+    async for row in rows:
+        writer.writerow(
+            {
+                key: json.dumps(value, ensure_ascii=False, default=_json_default)
+                if isinstance(value, list)
+                else value
+                for key, value in row.items()
+            }
+        )
+        written += 1
+        if written >= chunk_size:
+            yield output.getvalue().encode()
+            output.seek(0)
+            output.truncate(0)
+            written = 0
+    if output.tell():
+        yield output.getvalue().encode()
@@ -1,5 +1,6 @@
 from enum import Enum
 from http import HTTPStatus
+from typing import Optional
 
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -12,6 +13,19 @@ class Tags(Enum):
     buildings = "Buildings"
     activities = "Activities"
     organizations = "Organizations"
+    tiles = "Tiles"
+    monitoring = "Monitoring"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Проверка заголовка If-None-Match: список тегов через запятую или *, слабые теги W/"..."
+    сравниваются со строгими по значению, как требует RFC 9110 для условных GET запросов.
+    """
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in tags)
 
 
 def log_and_raise_error(
@@ -0,0 +1,36 @@
+import argparse
+import asyncio
+import json
+from pathlib import Path
+
+from buildings.bulk_import import import_buildings_csv, import_buildings_geojson
+from core.db import async_engine
+
+
+async def main(path: Path, import_format: str, strict: bool):
+    try:
+        if import_format == "geojson":
+            report = await import_buildings_geojson(path.read_bytes(), strict=strict)
+        else:
+            report = await import_buildings_csv(str(path), strict=strict)
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Массовая загрузка зданий из CSV или GeoJSON.")
+    parser.add_argument("path", type=Path, help="CSV с колонками address,latitude,longitude или GeoJSON")
+    parser.add_argument(
+        "--format",
+        choices=["csv", "geojson"],
+        help="Формат файла, по умолчанию определяется по расширению",
+    )
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        help="Не загружать ничего, если в файле есть строки с ошибками",
+    )
+    args = parser.parse_args()
+    file_format = args.format or ("geojson" if args.path.suffix.lower() in {".geojson", ".json"} else "csv")
+    asyncio.run(main(path=args.path, import_format=file_format, strict=args.strict))
@@ -6,24 +6,46 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.middleware.base import BaseHTTPMiddleware
 
+from activities.crud import activity_crud
+from buildings.radius_cache import building_radius_cache
+from buildings.spatial_index import building_spatial_index
 from core.authentication_utils import check_token
+from core.cache_versions import (
+    ACTIVITY_TREE_CACHE,
+    BUILDING_POINTS_CACHE,
+    BUILDINGS_CACHE,
+    TILES_CACHE,
+    bump_cache_versions,
+    cache_versions,
+)
 from core.db import get_async_session
+from core.routing import ReplicaFallbackMiddleware, replica_router
 from core.logger import logger, request_log
 from core.models import Building, Activity, activity_hierarchy, Organization
 from organizations.elastic_manager import elastic_manager
+from organizations.outbox import elastic_outbox_worker, enqueue_organization_sync
 from routers import main_router
 
 
 @asynccontextmanager
-async def close_es_connection_lifespan(app: FastAPI):
+async def app_lifespan(app: FastAPI):
+    await cache_versions.start()
+    elastic_outbox_worker.start()
+    await building_spatial_index.start()
+    await replica_router.start()
     logger.debug("Приложение запущено и готов к работе.")
     yield
+    await replica_router.stop()
+    await building_spatial_index.stop()
+    await elastic_outbox_worker.stop()
     await elastic_manager.close()
+    await cache_versions.stop()
 
 
-app = FastAPI(title="Bet Maker", lifespan=close_es_connection_lifespan)
+app = FastAPI(title="Bet Maker", lifespan=app_lifespan)
 
 origins = ["*"]
+app.add_middleware(ReplicaFallbackMiddleware)
 app.add_middleware(BaseHTTPMiddleware, dispatch=request_log)
 
 app.include_router(main_router)
@@ -94,6 +116,19 @@ async def load_initial_data(
             ]
         )
     )
+    for activity, parent in [
+        (activity1, None),
+        (activity2, activity1),
+        (activity3, activity2),
+        (activity4, None),
+        (activity5, activity4),
+        (activity6, activity5),
+    ]:
+        await activity_crud.add_closure_paths(
+            activity_id=activity.id,
+            parent_id=parent.id if parent else None,
+            session=session,
+        )
     logger.debug("Связи между видами деятельности добавлены в сессию.")
 
     organizations = [
@@ -130,8 +165,12 @@ async def load_initial_data(
     logger.debug("Организации добавлены в сессию.")
     await session.flush()
 
-    await elastic_manager.load_organizations_to_es(organizations=organizations)
+    enqueue_organization_sync(session, [organization.id for organization in organizations])
+    await bump_cache_versions(session, ACTIVITY_TREE_CACHE, TILES_CACHE, BUILDING_POINTS_CACHE, BUILDINGS_CACHE)
     await session.commit()
+    building_radius_cache.clear()
+    for building in buildings:
+        building_spatial_index.upsert(building.id, building.latitude, building.longitude)
     logger.debug("Первичные данные успешно загружены в БД.")
 
     return {"message": "Данные загружены успешно."}
@@ -0,0 +1,42 @@
+from fastapi import APIRouter
+from fastapi.params import Depends, Query
+
+from core.authentication_utils import check_token
+from core.config import settings
+from core.db import async_engine
+from core.pool import pool_status
+from core.routing import replica_router
+from core.slow_queries import slow_query_log
+from core.utils import Tags
+
+router = APIRouter(
+    prefix="/monitoring",
+    tags=[Tags.monitoring],
+    dependencies=[Depends(check_token)],
+)
+
+
+@router.get("/pool")
+async def get_pool_metrics():
+    pools = {"primary": pool_status(async_engine.pool)}
+    for replica in replica_router.replicas:
+        pools[replica.name] = pool_status(replica.engine.pool)
+    return pools
+
+
+@router.get("/replicas")
+async def get_replicas_status():
+    return {replica.name: replica.status() for replica in replica_router.replicas}
+
+
+@router.get("/slow-queries")
+async def get_slow_queries(
+    limit: int = Query(default=50, ge=1, le=settings.slow_query_buffer_size),
+):
+    return slow_query_log.recent(limit)
+
+
+@router.delete("/slow-queries")
+async def clear_slow_queries():
+    slow_query_log.clear()
+    return {"message": "Журнал медленных запросов очищен."}
@@ -1,14 +1,24 @@
+from decimal import Decimal
+from typing import AsyncIterator, Optional
+
 from fastapi import HTTPException
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy import select
+from geoalchemy2.functions import ST_DWithin
+from sqlalchemy import exists, select, func, tuple_
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
+from buildings.crud import BuildingCRUD
+from buildings.radius_cache import building_radius_cache
+from core.cache_versions import BUILDINGS_CACHE, TILES_CACHE, bump_cache_versions
+from core.config import settings
 from core.crud_foundation import CRUDBase
 from core.logger import logger
-from core.models import Organization, Building, Activity, organization_activity, activity_hierarchy
-from organizations.elastic_manager import elastic_manager
+from core.pagination import encode_cursor
+from core.models import Organization, Building, Activity, organization_activity, activity_closure
+from organizations.outbox import OUTBOX_DELETE, enqueue_organization_sync
+from organizations.queries import organization_directory_query
 
 
 class OrganizationCRUD(CRUDBase):
@@ -69,36 +79,86 @@ class OrganizationCRUD(CRUDBase):
 
     async def get_activity_tree_ids(self, activity_id: int, session: AsyncSession):
         """Получить организации по id вида деятельности первого уровня, то есть во всех вложенных видах деятельности."""
-        cte = select(activity_hierarchy.c.child_id).filter(activity_hierarchy.c.parent_id == activity_id).cte(
-            name="activity_tree", recursive=True
-        )
-
-        recursive_cte = cte.union_all(
-            select(activity_hierarchy.c.child_id)
-            .join(cte, activity_hierarchy.c.parent_id == cte.c.child_id)
-        )
-
-        result = await session.execute(
-            select(activity_hierarchy.c.parent_id)
-            .filter(activity_hierarchy.c.parent_id == activity_id)
-            .union_all(
-                select(recursive_cte.c.child_id)
-            )
-        )
-        activity_ids = [row[0] for row in result.fetchall()]
-
-        if not activity_ids:
-            activity_ids = [activity_id]
-
         result = await session.execute(
             select(Organization)
             .join(organization_activity, Organization.id == organization_activity.c.organization_id)
-            .filter(organization_activity.c.activity_id.in_(activity_ids))
+            .join(activity_closure, activity_closure.c.descendant_id == organization_activity.c.activity_id)
+            .filter(activity_closure.c.ancestor_id == activity_id)
         )
         organizations = result.unique().scalars().all()
 
         return organizations
 
+    async def get_nearby_in_activity_tree(
+        self,
+        activity_id: int,
+        latitude: Decimal,
+        longitude: Decimal,
+        radius_km: float,
+        session: AsyncSession,
+        limit: int = settings.default_page_size,
+        after: Optional[str] = None,
+    ) -> dict:
+        """
+        Страница организаций из ветки вида деятельности в радиусе от точки одним запросом.
+        Здания отбираются ST_DWithin по GiST индексу geo_point, организации здания - по индексу building_id,
+        принадлежность ветке проверяется подзапросом EXISTS по таблице замыкания. Постраничная выборка
+        идёт по ключу (расстояние, id), как и у зданий в радиусе.
+        """
+        point = BuildingCRUD.make_point(latitude, longitude)
+        distance = func.ST_Distance(Building.geo_point, point)
+        in_activity_tree = exists().where(
+            organization_activity.c.organization_id == Organization.id,
+            organization_activity.c.activity_id == activity_closure.c.descendant_id,
+            activity_closure.c.ancestor_id == activity_id,
+        )
+        query = (
+            select(
+                Organization.id,
+                Organization.name,
+                Organization.phones,
+                Organization.building_id,
+                Organization.create_date,
+                Organization.update_date,
+                Building.address,
+                Building.latitude,
+                Building.longitude,
+                distance.label("distance_m"),
+            )
+            .join(Building, Organization.building_id == Building.id)
+            .where(
+                ST_DWithin(Building.geo_point, point, radius_km * settings.meter_coefficient),
+                in_activity_tree,
+            )
+            .order_by(distance, Organization.id)
+            .limit(limit + 1)
+        )
+        if after:
+            query = query.where(
+                tuple_(distance, Organization.id) > tuple_(*BuildingCRUD.decode_distance_cursor(after))
+            )
+        result = await session.execute(query)
+        rows = result.mappings().all()
+        items = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = encode_cursor(items[-1]["distance_m"], items[-1]["id"])
+        return {"items": items, "next_cursor": next_cursor}
+
+    async def stream_directory(self, session: AsyncSession, chunk_size: int) -> AsyncIterator[dict]:
+        """
+        Потоковая выгрузка справочника организаций со зданием и видами деятельности.
+        Строки читаются серверным курсором пачками по chunk_size, поэтому память не зависит от размера таблицы.
+        """
+        result = await session.stream(
+            organization_directory_query()
+            .order_by(Organization.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        async for partition in result.mappings().partitions():
+            for row in partition:
+                yield dict(row)
+
     async def handle_integrity_error(self, e: IntegrityError):
         error_message = str(e.orig)
         if "organizations_building_id_fkey" in str(e.orig):
@@ -123,6 +183,9 @@ class OrganizationCRUD(CRUDBase):
             )
         logger.info("hfjdkf")
         organization.activities.append(activity)
+        enqueue_organization_sync(session, [organization.id])
+        if organization.building_id is not None:
+            await bump_cache_versions(session, TILES_CACHE)
         try:
             await session.commit()
         except IntegrityError as e:
@@ -140,6 +203,9 @@ class OrganizationCRUD(CRUDBase):
             )
 
         organization.activities.remove(activity)
+        enqueue_organization_sync(session, [organization.id])
+        if organization.building_id is not None:
+            await bump_cache_versions(session, TILES_CACHE)
         try:
             await session.commit()
         except IntegrityError as e:
@@ -147,15 +213,19 @@ class OrganizationCRUD(CRUDBase):
         return organization
 
     async def create(self, create_data, session: AsyncSession):
-        """Создание объекта организации, а так же добавление в индекс Elastic Search."""
+        """Создание объекта организации, а так же постановка в очередь на добавление в индекс Elastic Search."""
         create_data = create_data.model_dump()
         new_obj = self.model(**create_data)
         try:
             session.add(new_obj)
+            await session.flush()
+            enqueue_organization_sync(session, [new_obj.id])
+            if new_obj.building_id is not None:
+                await bump_cache_versions(session, TILES_CACHE, BUILDINGS_CACHE)
             await session.commit()
+            building_radius_cache.invalidate_buildings({new_obj.building_id})
             await session.refresh(new_obj)
-            await elastic_manager.add_organization_to_es(org_id=new_obj.id, org_name=new_obj.name)
-            logger.debug("Имя добавлено в индекс Elastic Search")
+            logger.debug("Организация поставлена в очередь на добавление в индекс Elastic Search")
             return new_obj
         except IntegrityError as e:
             await session.rollback()
@@ -167,20 +237,27 @@ class OrganizationCRUD(CRUDBase):
         obj_in,
         session: AsyncSession,
     ):
-        """Обновление объекта организации, а так же обновление имени в Elastic Search при необходимости."""
+        """Обновление объекта организации, а так же постановка в очередь на обновление документа в Elastic Search."""
         obj_data = jsonable_encoder(db_obj)
         update_data = obj_in.model_dump(exclude_unset=True)
+        previous_building_id = db_obj.building_id
 
         for field in obj_data:
             if field in update_data:
                 setattr(db_obj, field, update_data[field])
         try:
             session.add(db_obj)
+            enqueue_organization_sync(session, [db_obj.id])
+            logger.debug("Организация поставлена в очередь на обновление в индексе Elastic Search")
+            # В тайлах у зданий только количество организаций и их виды деятельности, переименование их не меняет.
+            # Кэш зданий по радиусу хранит организации целиком, поэтому сбрасывается при любом изменении.
+            if db_obj.building_id != previous_building_id:
+                await bump_cache_versions(session, TILES_CACHE, BUILDINGS_CACHE)
+            elif db_obj.building_id is not None:
+                await bump_cache_versions(session, BUILDINGS_CACHE)
             await session.commit()
+            building_radius_cache.invalidate_buildings({previous_building_id, db_obj.building_id})
             await session.refresh(db_obj)
-            if update_data.get("name", None) is not None:
-                await elastic_manager.update_organization_in_es(org_id=db_obj.id, org_name=db_obj.name)
-                logger.debug("Имя обновлено в индексе Elastic Search")
             return db_obj
         except IntegrityError as e:
             await session.rollback()
@@ -191,11 +268,14 @@ class OrganizationCRUD(CRUDBase):
         db_obj,
         session: AsyncSession,
     ):
-        """Удаление объекта организации, а так же из индекса Elastic Search."""
+        """Удаление объекта организации, а так же постановка в очередь на удаление из индекса Elastic Search."""
         await session.delete(db_obj)
+        enqueue_organization_sync(session, [db_obj.id], operation=OUTBOX_DELETE)
+        if db_obj.building_id is not None:
+            await bump_cache_versions(session, TILES_CACHE, BUILDINGS_CACHE)
         await session.commit()
-        await elastic_manager.delete_organization_from_es(org_id=db_obj.id)
-        logger.debug("Имя удалено из Elastic Search")
+        building_radius_cache.invalidate_buildings({db_obj.building_id})
+        logger.debug("Организация поставлена в очередь на удаление из Elastic Search")
         return db_obj
 
 organization_crud = OrganizationCRUD(Organization)
\ No newline at end of file
@@ -1,60 +1,177 @@
+from typing import Mapping, Optional
+
 from elasticsearch import AsyncElasticsearch
+from elasticsearch.helpers import async_bulk
 
 from core.config import settings
 from core.logger import logger
-from core.models import Organization
+from organizations.es_index import ORGANIZATION_INDEX_BODY, versioned_index_name
 
 
 class ElasticManager:
-    def __init__(self, es_host: str):
+    def __init__(self, es_host: str, index_alias: str):
         self.es = AsyncElasticsearch(es_host)
+        # Чтение и запись идут через псевдоним, физический индекс за ним подменяется при переиндексации.
+        self.index_name = index_alias
+
+    @staticmethod
+    def build_organization_document(organization: Mapping) -> dict:
+        """
+        Денормализованный документ организации из строки organization_directory_query.
+        Координаты передаются строками, чтобы в _source сохранилась исходная точность Numeric.
+        """
+        latitude, longitude = organization["latitude"], organization["longitude"]
+        has_location = latitude is not None and longitude is not None
+        return {
+            "id": organization["id"],
+            "name": organization["name"],
+            "phones": organization["phones"] or [],
+            "building_id": organization["building_id"],
+            "address": organization["address"],
+            "latitude": str(latitude) if latitude is not None else None,
+            "longitude": str(longitude) if longitude is not None else None,
+            "location": {"lat": float(latitude), "lon": float(longitude)} if has_location else None,
+            "activity_ids": organization["activity_ids"] or [],
+            "activity_names": organization["activity_names"] or [],
+            "activity_tree_ids": organization["activity_tree_ids"] or [],
+            "create_date": organization["create_date"].isoformat(),
+            "update_date": organization["update_date"].isoformat(),
+        }
+
+    async def bulk(self, actions: list[dict], chunk_size: int = 500) -> dict[str, dict]:
+        """
+        Отправка пачки операций через bulk API.
+        Возвращает ошибки по id документов, удаление отсутствующих документов ошибкой не считается.
+        """
+        _, errors = await async_bulk(
+            self.es,
+            actions,
+            chunk_size=chunk_size,
+            raise_on_error=False,
+            raise_on_exception=False,
+        )
+        failed = {}
+        for error in errors:
+            op_type, item = next(iter(error.items()))
+            status_code = item.get("status")
+            if op_type == "delete" and status_code == 404:
+                continue
+            failed[str(item.get("_id"))] = item
+        logger.debug(f"В Elastic Search отправлено операций: {len(actions)}, с ошибкой: {len(failed)}.")
+        return failed
 
     async def close(self):
         await self.es.close()
         logger.debug("Соединение с Elastic Search разорвано.")
 
-    async def load_organizations_to_es(self, organizations: list[Organization]):
-        for org in organizations:
-            await self.add_organization_to_es(org_id=org.id, org_name=org.name)
-            await self.es.index(
-                index="organizations",
-                id=org.id,
-                document={
-                    "id": org.id,
-                    "name": org.name,
-                },
-            )
-        logger.debug("Все переданные организации переданы в индекс Elastic Search.")
-
-    async def add_organization_to_es(
-        self, org_id: int, org_name: str,
-    ):
-        response = await self.es.index(
-            index="organizations",
-            id=org_id,
-            document={"id": org_id, "name": org_name},
-        )
-        logger.debug(f"Добавлена организация {org_name} в индекс.")
-        return response
-
-    async def update_organization_in_es(self, org_id: int, org_name: str):
-        await self.es.update(
-            index="organizations",
-            id=org_id,
-            body={"doc": {"name": org_name}},
+    async def get_refresh_interval(self, index: str) -> Optional[str]:
+        response = await self.es.indices.get_settings(index=index, name="index.refresh_interval")
+        index_settings = next(iter(response.body.values()), {}).get("settings", {})
+        return index_settings.get("index", {}).get("refresh_interval")
+
+    async def set_refresh_interval(self, index: str, refresh_interval: Optional[str]):
+        """Изменение интервала обновления индекса, None возвращает значение по умолчанию."""
+        await self.es.indices.put_settings(
+            index=index, settings={"index": {"refresh_interval": refresh_interval}}
         )
-        logger.debug(f"Организация {org_name} обновлена в индексе Elastic Search.")
+        logger.debug(f"Для индекса {index} установлен refresh_interval={refresh_interval}.")
+
+    async def create_versioned_index(self) -> str:
+        """Создание нового физического индекса с актуальным маппингом, без привязки к псевдониму."""
+        index = versioned_index_name(self.index_name)
+        await self.es.indices.create(index=index, **ORGANIZATION_INDEX_BODY)
+        logger.debug(f"Создан индекс {index}.")
+        return index
 
-    async def delete_organization_from_es(self, org_id: int):
-        await self.es.delete(index="organizations", id=org_id)
-        logger.debug(f"Организация с id {org_id} удалена из индекса Elastic Search.")
+    async def get_alias_indices(self) -> list[str]:
+        if not await self.es.indices.exists_alias(name=self.index_name):
+            return []
+        response = await self.es.indices.get_alias(name=self.index_name)
+        return list(response.body.keys())
 
-    async def search_organizations_by_name(self, name: str, size: int = 10):
+    async def swap_alias(self, new_index: str) -> list[str]:
+        """Атомарное переключение псевдонима на новый индекс, возвращает индексы, с которых он снят."""
+        old_indices = await self.get_alias_indices()
+        await self.es.indices.update_aliases(
+            actions=[
+                *({"remove": {"index": index, "alias": self.index_name}} for index in old_indices),
+                {"add": {"index": new_index, "alias": self.index_name, "is_write_index": True}},
+            ]
+        )
+        logger.info(f"Псевдоним {self.index_name} переключён на индекс {new_index}.")
+        return old_indices
+
+    async def search_organizations_by_name(self, name: str, size: int = 10, offset: int = 0):
+        """Поиск организаций по имени, документы возвращаются в порядке релевантности."""
         response = await self.es.search(
-            index="organizations",
-            body={"query": {"match": {"name": name}}, "size": size},
+            index=self.index_name,
+            query={"match": {"name": name}},
+            size=size,
+            from_=offset,
+            track_total_hits=False,
         )
         return [hit["_source"] for hit in response["hits"]["hits"]]
 
+    async def search_organizations(
+        self,
+        name: Optional[str] = None,
+        point: Optional[tuple[float, float]] = None,
+        radius_km: Optional[float] = None,
+        bbox: Optional[tuple[float, float, float, float]] = None,
+        activity_id: Optional[int] = None,
+        size: int = 10,
+        offset: int = 0,
+    ) -> list[dict]:
+        """
+        Поиск организаций одним запросом: текст по имени, радиус или прямоугольник (min_lat, min_lon, max_lat, max_lon)
+        и ветка видов деятельности. При переданной точке результаты сортируются по расстоянию до неё.
+        """
+        filters = []
+        if point is not None and radius_km is not None:
+            filters.append(
+                {"geo_distance": {"distance": f"{radius_km}km", "location": {"lat": point[0], "lon": point[1]}}}
+            )
+        if bbox is not None:
+            min_lat, min_lon, max_lat, max_lon = bbox
+            filters.append(
+                {
+                    "geo_bounding_box": {
+                        "location": {
+                            "top_left": {"lat": max_lat, "lon": min_lon},
+                            "bottom_right": {"lat": min_lat, "lon": max_lon},
+                        }
+                    }
+                }
+            )
+        if activity_id is not None:
+            filters.append({"term": {"activity_tree_ids": activity_id}})
+        query = {
+            "bool": {
+                "must": [{"match": {"name": name}}] if name else [{"match_all": {}}],
+                "filter": filters,
+            }
+        }
+        sort = None
+        if point is not None:
+            sort = [
+                {"_geo_distance": {"location": {"lat": point[0], "lon": point[1]}, "order": "asc", "unit": "m"}},
+                "_score",
+            ]
+        response = await self.es.search(
+            index=self.index_name,
+            query=query,
+            sort=sort,
+            size=size,
+            from_=offset,
+            track_total_hits=False,
+        )
+        organizations = []
+        for hit in response["hits"]["hits"]:
+            organization = hit["_source"]
+            if point is not None:
+                organization["distance_m"] = hit["sort"][0]
+            organizations.append(organization)
+        return organizations
+
 
-elastic_manager = ElasticManager(settings.es_address)
+elastic_manager = ElasticManager(settings.es_address, settings.es_index_alias)
@@ -1,14 +1,31 @@
-from fastapi import APIRouter, HTTPException, status
-from fastapi.params import Depends, Path
+from decimal import Decimal
+from typing import Literal, Optional
+
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request, status
+from fastapi.params import Depends, Path, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from activities.crud import activity_crud
 from core.authentication_utils import check_token
-from core.db import get_async_session
+from core.config import settings
+from core.logger import logger
+from core.pagination import Page, PaginationParams
+from core.routing import get_routed_session, read_session_factory
+from core.streaming import csv_chunks, ndjson_chunks
 from core.utils import Tags, check_exists_and_get_or_return_error
 from organizations.crud import organization_crud
 from organizations.elastic_manager import elastic_manager
-from organizations.schemas import OrganizationCreate, OrganizationUpdate, OrganizationDB, OrganizationShortDB
+from organizations.reindex import blue_green_reindex, is_reindex_running, reindex_organizations
+from organizations.schemas import (
+    OrganizationCreate,
+    OrganizationUpdate,
+    OrganizationDB,
+    OrganizationShortDB,
+    OrganizationSearchDB,
+    OrganizationGeoSearchDB,
+    OrganizationNearbyDB,
+)
 from organizations.validators import check_first_level_activity
 
 router = APIRouter(
@@ -23,7 +40,7 @@ router = APIRouter(
     response_model=OrganizationDB
 )
 async def get_organization_by_id(
-        organization_id: int = Path(...), session: AsyncSession = Depends(get_async_session)
+        organization_id: int = Path(...), session: AsyncSession = Depends(get_routed_session)
 ):
     return await check_exists_and_get_or_return_error(
         db_id=organization_id,
@@ -40,7 +57,7 @@ async def get_organization_by_id(
     response_model=list[OrganizationShortDB]
 )
 async def get_organizations_by_building_id(
-        building_id: int = Path(...), session: AsyncSession = Depends(get_async_session)
+        building_id: int = Path(...), session: AsyncSession = Depends(get_routed_session)
 ):
     return await organization_crud.get_by_building_id(building_id=building_id, session=session)
 
@@ -50,7 +67,7 @@ async def get_organizations_by_building_id(
     response_model=list[OrganizationShortDB]
 )
 async def get_organizations_by_activity_id(
-        activity_id: int = Path(...), session: AsyncSession = Depends(get_async_session)
+        activity_id: int = Path(...), session: AsyncSession = Depends(get_routed_session)
 ):
     return await organization_crud.get_by_activity_id(activity_id=activity_id, session=session)
 
@@ -60,7 +77,7 @@ async def get_organizations_by_activity_id(
     response_model=list[OrganizationShortDB]
 )
 async def get_organizations_by_first_level_activity(
-        activity_id: int = Path(...), session: AsyncSession = Depends(get_async_session)
+        activity_id: int = Path(...), session: AsyncSession = Depends(get_routed_session)
 ):
     await check_first_level_activity(activity_id=activity_id, session=session)
     return await organization_crud.get_activity_tree_ids(activity_id=activity_id, session=session)
@@ -68,28 +85,109 @@ async def get_organizations_by_first_level_activity(
 
 @router.get(
     "/search_by_name",
-    response_model=list[OrganizationShortDB]
+    response_model=list[OrganizationSearchDB]
 )
 async def search_organizations(
-        name: str, session: AsyncSession = Depends(get_async_session)
+        name: str,
+        limit: int = Query(10, ge=1, le=100),
+        offset: int = Query(0, ge=0, le=9900),
 ):
     try:
-        organizations = await elastic_manager.search_organizations_by_name(name)
-        ids = [organization["id"] for organization in organizations]
-        return await organization_crud.get_by_list_of_ids(ids=ids, session=session)
+        return await elastic_manager.search_organizations_by_name(name, size=limit, offset=offset)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get(
+    "/search",
+    response_model=list[OrganizationGeoSearchDB]
+)
+async def search_organizations_combined(
+        name: Optional[str] = Query(None, min_length=1),
+        latitude: Optional[float] = Query(None, ge=-90, le=90),
+        longitude: Optional[float] = Query(None, ge=-180, le=180),
+        radius_km: Optional[float] = Query(None, gt=0, le=settings.max_radius_km),
+        min_latitude: Optional[float] = Query(None, ge=-90, le=90),
+        min_longitude: Optional[float] = Query(None, ge=-180, le=180),
+        max_latitude: Optional[float] = Query(None, ge=-90, le=90),
+        max_longitude: Optional[float] = Query(None, ge=-180, le=180),
+        activity_id: Optional[int] = None,
+        limit: int = Query(10, ge=1, le=100),
+        offset: int = Query(0, ge=0, le=9900),
+):
+    if (latitude is None) != (longitude is None):
+        raise HTTPException(status_code=400, detail="Широта и долгота передаются только вместе.")
+    if radius_km is not None and latitude is None:
+        raise HTTPException(status_code=400, detail="Для поиска в радиусе нужна точка отсчёта.")
+    bbox = (min_latitude, min_longitude, max_latitude, max_longitude)
+    if any(value is None for value in bbox):
+        if any(value is not None for value in bbox):
+            raise HTTPException(status_code=400, detail="Прямоугольник задаётся всеми четырьмя границами.")
+        bbox = None
+    elif min_latitude > max_latitude or min_longitude > max_longitude:
+        raise HTTPException(
+            status_code=400,
+            detail="Минимальные границы прямоугольника должны быть меньше максимальных.",
+        )
+    try:
+        return await elastic_manager.search_organizations(
+            name=name,
+            point=(latitude, longitude) if latitude is not None else None,
+            radius_km=radius_km,
+            bbox=bbox,
+            activity_id=activity_id,
+            size=limit,
+            offset=offset,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get(
+    "/nearby",
+    response_model=Page[OrganizationNearbyDB]
+)
+async def get_nearby_organizations(
+        activity_id: int = Query(...),
+        latitude: Decimal = Query(..., ge=-90, le=90),
+        longitude: Decimal = Query(..., ge=-180, le=180),
+        radius_km: float = Query(..., gt=0, le=settings.max_radius_km),
+        pagination: PaginationParams = Depends(),
+        session: AsyncSession = Depends(get_routed_session),
+):
+    try:
+        return await organization_crud.get_nearby_in_activity_tree(
+            activity_id=activity_id,
+            latitude=latitude,
+            longitude=longitude,
+            radius_km=radius_km,
+            session=session,
+            limit=pagination.limit,
+            after=pagination.after,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            detail=f"{e}",
+            status_code=500,
+        )
+
+
 @router.get(
     "/get-all",
-    response_model=list[OrganizationShortDB]
+    response_model=Page[OrganizationShortDB]
 )
 async def get_all_organizations(
-        session: AsyncSession = Depends(get_async_session),
+        pagination: PaginationParams = Depends(),
+        session: AsyncSession = Depends(get_routed_session),
 ):
     try:
-        return await organization_crud.get_multi(session=session)
+        return await organization_crud.get_page(
+            session=session, limit=pagination.limit, after=pagination.after
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             detail=f"{e}",
@@ -97,12 +195,74 @@ async def get_all_organizations(
         )
 
 
+EXPORT_FIELDS = [
+    "id",
+    "name",
+    "phones",
+    "building_id",
+    "address",
+    "latitude",
+    "longitude",
+    "activity_ids",
+    "activity_names",
+    "create_date",
+    "update_date",
+]
+
+
+@router.get("/export")
+async def export_organizations(
+        request: Request,
+        export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+):
+    session_factory = read_session_factory(request)
+
+    async def export_stream():
+        # Сессия открывается внутри генератора, так как сессия из зависимости закрывается до отправки тела ответа.
+        async with session_factory() as session:
+            rows = organization_crud.stream_directory(
+                session=session, chunk_size=settings.export_chunk_size
+            )
+            if export_format == "csv":
+                chunks = csv_chunks(rows, EXPORT_FIELDS, settings.export_chunk_size)
+            else:
+                chunks = ndjson_chunks(rows, settings.export_chunk_size)
+            async for chunk in chunks:
+                yield chunk
+        logger.debug(f"Выгрузка справочника организаций в формате {export_format} завершена.")
+
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        export_stream(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="organizations.{export_format}"'},
+    )
+
+
+@router.post("/reindex")
+async def reindex_all_organizations(
+        background_tasks: BackgroundTasks,
+        mode: Literal["blue_green", "in_place"] = Query("blue_green"),
+        chunk_size: int = Query(settings.es_reindex_chunk_size, ge=1, le=10000),
+        concurrency: int = Query(settings.es_reindex_concurrency, ge=1, le=32),
+):
+    # Быстрый ответ 409 для повторного запуска, исключительность самой переиндексации обеспечивает блокировка в БД.
+    if await is_reindex_running():
+        raise HTTPException(
+            detail="Переиндексация организаций уже выполняется.",
+            status_code=status.HTTP_409_CONFLICT,
+        )
+    reindex = blue_green_reindex if mode == "blue_green" else reindex_organizations
+    background_tasks.add_task(reindex, chunk_size=chunk_size, concurrency=concurrency)
+    return {"message": "Переиндексация организаций запущена."}
+
+
 @router.post(
     "/create",
     response_model=OrganizationShortDB
 )
 async def create_new_organization(
-        client_data: OrganizationCreate, session: AsyncSession = Depends(get_async_session)
+        client_data: OrganizationCreate, session: AsyncSession = Depends(get_routed_session)
 ):
     return await organization_crud.create(client_data, session)
 
@@ -112,7 +272,7 @@ async def create_new_organization(
     response_model=OrganizationDB
 )
 async def add_activity(
-        organization_id: int, activity_id: int, session: AsyncSession = Depends(get_async_session)
+        organization_id: int, activity_id: int, session: AsyncSession = Depends(get_routed_session)
 ):
     organization = await check_exists_and_get_or_return_error(
         db_id=organization_id,
@@ -138,7 +298,7 @@ async def add_activity(
     response_model=OrganizationDB
 )
 async def remove_activity(
-        organization_id: int, activity_id: int, session: AsyncSession = Depends(get_async_session)
+        organization_id: int, activity_id: int, session: AsyncSession = Depends(get_routed_session)
 ):
     organization = await check_exists_and_get_or_return_error(
         db_id=organization_id,
@@ -166,7 +326,7 @@ async def remove_activity(
 async def update_organization(
         organization_data: OrganizationUpdate,
         organization_id: int = Path(...),
-        session: AsyncSession = Depends(get_async_session),
+        session: AsyncSession = Depends(get_routed_session),
 ):
     organization = await check_exists_and_get_or_return_error(
         db_id=organization_id,
@@ -184,7 +344,7 @@ async def update_organization(
 @router.delete("/delete-organization-by-id/{organization_id}")
 async def delete_organization_by_id(
         organization_id: int = Path(...),
-        session: AsyncSession = Depends(get_async_session),
+        session: AsyncSession = Depends(get_routed_session),
 ):
     organization = await check_exists_and_get_or_return_error(
         db_id=organization_id,
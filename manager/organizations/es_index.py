@@ -0,0 +1,26 @@
+from datetime import datetime, timezone
+
+ORGANIZATION_INDEX_BODY = {
+    "mappings": {
+        "properties": {
+            "id": {"type": "integer"},
+            "name": {"type": "text"},
+            "phones": {"type": "keyword"},
+            "building_id": {"type": "integer"},
+            "address": {"type": "text"},
+            "latitude": {"type": "double", "index": False},
+            "longitude": {"type": "double", "index": False},
+            "location": {"type": "geo_point"},
+            "activity_ids": {"type": "integer"},
+            "activity_names": {"type": "text"},
+            "activity_tree_ids": {"type": "integer"},
+            "create_date": {"type": "date"},
+            "update_date": {"type": "date"},
+        }
+    }
+}
+
+
+def versioned_index_name(alias: str) -> str:
+    """Имя нового физического индекса за псевдонимом, например organizations_20260117103000."""
+    return f"{alias}_{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}"
@@ -0,0 +1,234 @@
+import asyncio
+import time
+from datetime import timedelta
+from typing import Iterable, Mapping, Optional
+
+from sqlalchemy import Integer, bindparam, delete, insert, literal, or_, select, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+
+from core.config import settings
+from core.db import AsyncSessionLocal
+from core.logger import logger
+from core.models import ElasticOutbox, Organization
+from organizations.elastic_manager import ElasticManager, elastic_manager
+from organizations.queries import organization_directory_query
+
+OUTBOX_INDEX = "index"
+OUTBOX_DELETE = "delete"
+PURGE_INTERVAL = 60
+# Пространство ключей рекомендательных блокировок организаций, отдельное от блокировки переиндексации.
+ORGANIZATION_SYNC_LOCK_NAMESPACE = 7_200_155
+
+LOCK_ORGANIZATIONS = text(
+    "SELECT id FROM unnest(CAST(:organization_ids AS integer[])) AS id "
+    "WHERE pg_try_advisory_xact_lock(:namespace, id)"
+).bindparams(bindparam("organization_ids", type_=ARRAY(Integer)))
+
+
+def enqueue_organization_sync(
+    session: AsyncSession, organization_ids: Iterable[int], operation: str = OUTBOX_INDEX
+) -> None:
+    """
+    Регистрация изменений организаций в outbox в рамках текущей транзакции.
+    Запись попадёт в Elastic Search только после коммита, поэтому индекс не расходится с БД.
+    """
+    session.add_all(
+        ElasticOutbox(organization_id=organization_id, operation=operation)
+        for organization_id in organization_ids
+    )
+
+
+async def enqueue_organizations_sync_where(session: AsyncSession, *criteria) -> None:
+    """Постановка в outbox всех организаций, подходящих под условия, одним запросом INSERT ... SELECT."""
+    await session.execute(
+        insert(ElasticOutbox).from_select(
+            ["organization_id", "operation"],
+            select(Organization.id, literal(OUTBOX_INDEX)).where(*criteria),
+        )
+    )
+
+
+class ElasticOutboxWorker:
+    """
+    Фоновая задача, переносящая записи outbox в Elastic Search пачками.
+    Документ каждый раз собирается из закоммиченного состояния БД и отправляется без внешней версии:
+    id записи outbox назначается при flush, а транзакции коммитятся в другом порядке, поэтому он не годится
+    в версии. Порядок отправок одной организации задаёт рекомендательная блокировка на время транзакции
+    обработчика: состояние загружается только после того, как предыдущая отправка этой организации
+    завершилась, и каждая отправка новее предыдущей. Записи организаций, занятых другим экземпляром,
+    остаются в очереди до следующей пачки. Записи, исчерпавшие попытки, переводятся в dead-letter (failed_at)
+    и удаляются вместе с обработанными по истечении срока хранения.
+    """
+
+    def __init__(
+        self,
+        manager: ElasticManager,
+        batch_size: int,
+        poll_interval: float,
+        retry_delay: float,
+        max_attempts: int,
+        retention_seconds: int,
+    ):
+        self.manager = manager
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.max_attempts = max_attempts
+        self.retention_seconds = retention_seconds
+        self._stop_event = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._last_purge = 0.0
+
+    def start(self) -> None:
+        self._stop_event.clear()
+        self._task = asyncio.create_task(self._run())
+        logger.debug("Обработчик outbox Elastic Search запущен.")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stop_event.set()
+        await self._task
+        self._task = None
+        logger.debug("Обработчик outbox Elastic Search остановлен.")
+
+    async def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                processed = await self.process_batch()
+                if processed < self.batch_size and time.monotonic() - self._last_purge > PURGE_INTERVAL:
+                    await self.purge_processed()
+                    self._last_purge = time.monotonic()
+            except Exception as e:
+                logger.error(f"Ошибка обработки outbox Elastic Search: {e}")
+                processed = 0
+            if processed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def build_actions(
+        self, entries: list[ElasticOutbox], organizations: dict[int, Mapping]
+    ) -> list[dict]:
+        """Операции bulk API по последней записи outbox для каждой организации."""
+        actions = []
+        for entry in entries:
+            action = {
+                "_op_type": entry.operation,
+                "_index": self.manager.index_name,
+                "_id": entry.organization_id,
+            }
+            if entry.operation == OUTBOX_INDEX:
+                organization = organizations.get(entry.organization_id)
+                if organization is None:
+                    # Организация уже удалена, документ уберёт следующая запись outbox с операцией delete.
+                    continue
+                action["_source"] = self.manager.build_organization_document(organization)
+            actions.append(action)
+        return actions
+
+    @staticmethod
+    async def load_organizations(
+        organization_ids: list[int], session: AsyncSession
+    ) -> dict[int, Mapping]:
+        if not organization_ids:
+            return {}
+        result = await session.execute(
+            organization_directory_query().where(Organization.id.in_(organization_ids))
+        )
+        return {organization["id"]: organization for organization in result.mappings().all()}
+
+    @staticmethod
+    async def lock_organizations(organization_ids: list[int], session: AsyncSession) -> set[int]:
+        """Организации, для которых удалось взять блокировку до конца транзакции обработчика."""
+        result = await session.execute(
+            LOCK_ORGANIZATIONS,
+            {"organization_ids": organization_ids, "namespace": ORGANIZATION_SYNC_LOCK_NAMESPACE},
+        )
+        return set(result.scalars().all())
+
+    async def process_batch(self) -> int:
+        """Обработка одной пачки записей outbox, возвращает количество взятых в работу записей."""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(ElasticOutbox)
+                .where(
+                    ElasticOutbox.processed_at.is_(None),
+                    ElasticOutbox.next_attempt_at <= func.now(),
+                    ElasticOutbox.attempts < self.max_attempts,
+                )
+                .order_by(ElasticOutbox.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            entries = result.scalars().all()
+            if not entries:
+                return 0
+            locked_ids = await self.lock_organizations(sorted({entry.organization_id for entry in entries}), session)
+            entries = [entry for entry in entries if entry.organization_id in locked_ids]
+            if not entries:
+                await session.rollback()
+                return 0
+
+            latest_entries: dict[int, ElasticOutbox] = {}
+            for entry in entries:
+                latest_entries[entry.organization_id] = entry
+            organizations = await self.load_organizations(
+                [
+                    entry.organization_id
+                    for entry in latest_entries.values()
+                    if entry.operation == OUTBOX_INDEX
+                ],
+                session,
+            )
+            actions = self.build_actions(list(latest_entries.values()), organizations)
+
+            try:
+                failed = await self.manager.bulk(actions) if actions else {}
+            except Exception as e:
+                failed = {str(entry.organization_id): {"error": str(e)} for entry in entries}
+
+            for entry in entries:
+                error = failed.get(str(entry.organization_id))
+                if error is None:
+                    entry.processed_at = func.now()
+                    continue
+                entry.attempts += 1
+                entry.last_error = str(error.get("error"))
+                entry.next_attempt_at = func.now() + timedelta(
+                    seconds=self.retry_delay * 2 ** (entry.attempts - 1)
+                )
+                if entry.attempts >= self.max_attempts:
+                    entry.failed_at = func.now()
+                    logger.error(
+                        f"Запись outbox {entry.id} для организации {entry.organization_id} "
+                        f"не передана в Elastic Search после {entry.attempts} попыток и переведена в dead-letter: "
+                        f"{entry.last_error}"
+                    )
+            await session.commit()
+            logger.debug(f"Обработано записей outbox: {len(entries)}, с ошибкой: {len(failed)}.")
+            return len(entries)
+
+    async def purge_processed(self) -> None:
+        """Удаление обработанных записей и записей dead-letter старше срока хранения."""
+        expired_at = func.now() - timedelta(seconds=self.retention_seconds)
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                delete(ElasticOutbox).where(
+                    or_(ElasticOutbox.processed_at < expired_at, ElasticOutbox.failed_at < expired_at)
+                )
+            )
+            await session.commit()
+
+
+elastic_outbox_worker = ElasticOutboxWorker(
+    manager=elastic_manager,
+    batch_size=settings.es_outbox_batch_size,
+    poll_interval=settings.es_outbox_poll_interval,
+    retry_delay=settings.es_outbox_retry_delay,
+    max_attempts=settings.es_outbox_max_attempts,
+    retention_seconds=settings.es_outbox_retention_seconds,
+)
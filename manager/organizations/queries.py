@@ -0,0 +1,43 @@
+from sqlalchemy import Select, func, select, true
+
+from core.models import Activity, Building, Organization, activity_closure, organization_activity
+
+
+def organization_directory_query() -> Select:
+    """Запрос организаций с денормализованными данными здания и видов деятельности, по строке на организацию."""
+    activities = (
+        select(
+            func.array_agg(Activity.id).label("activity_ids"),
+            func.array_agg(Activity.name).label("activity_names"),
+        )
+        .select_from(organization_activity)
+        .join(Activity, Activity.id == organization_activity.c.activity_id)
+        .where(organization_activity.c.organization_id == Organization.id)
+        .lateral("organization_activities_agg")
+    )
+    activity_tree = (
+        select(func.array_agg(activity_closure.c.ancestor_id.distinct()).label("activity_tree_ids"))
+        .select_from(organization_activity)
+        .join(activity_closure, activity_closure.c.descendant_id == organization_activity.c.activity_id)
+        .where(organization_activity.c.organization_id == Organization.id)
+        .lateral("organization_activity_tree_agg")
+    )
+    return (
+        select(
+            Organization.id,
+            Organization.name,
+            Organization.phones,
+            Organization.building_id,
+            Building.address,
+            Building.latitude,
+            Building.longitude,
+            activities.c.activity_ids,
+            activities.c.activity_names,
+            activity_tree.c.activity_tree_ids,
+            Organization.create_date,
+            Organization.update_date,
+        )
+        .outerjoin(Building, Building.id == Organization.building_id)
+        .join(activities, true())
+        .join(activity_tree, true())
+    )
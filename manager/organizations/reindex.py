@@ -0,0 +1,247 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+
+from core.config import settings
+from core.db import AsyncSessionLocal, async_engine
+from core.logger import logger
+from core.models import ElasticOutbox, Organization
+from organizations.elastic_manager import elastic_manager
+from organizations.queries import organization_directory_query
+
+# Ключ рекомендательной блокировки PostgreSQL, общей для всех процессов, запускающих переиндексацию.
+REINDEX_LOCK_KEY = 7_200_154
+
+
+class ReindexInProgressError(RuntimeError):
+    """Переиндексация уже выполняется в этом или другом процессе."""
+
+
+@asynccontextmanager
+async def reindex_lock():
+    """
+    Не больше одной переиндексации одновременно во всех экземплярах сервиса и в CLI.
+    Блокировка уровня сессии держится на отдельном соединении до конца переиндексации.
+    """
+    async with async_engine.connect() as connection:
+        acquired = await connection.scalar(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": REINDEX_LOCK_KEY}
+        )
+        if not acquired:
+            raise ReindexInProgressError("Переиндексация организаций уже выполняется.")
+        try:
+            yield
+        finally:
+            await connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": REINDEX_LOCK_KEY})
+
+
+async def is_reindex_running() -> bool:
+    async with AsyncSessionLocal() as session:
+        return await session.scalar(
+            text(
+                "SELECT EXISTS (SELECT 1 FROM pg_locks WHERE locktype = 'advisory' AND classid = 0 "
+                "AND objid = :key AND objsubid = 1 AND granted)"
+            ),
+            {"key": REINDEX_LOCK_KEY},
+        )
+
+
+async def restore_refresh_interval(index: str, refresh_interval: Optional[str]) -> None:
+    """Возврат refresh_interval после прерванной загрузки, ошибка пишется в лог и не скрывает исходную."""
+    try:
+        await elastic_manager.set_refresh_interval(index, refresh_interval)
+        await elastic_manager.es.indices.refresh(index=index)
+    except Exception as e:
+        logger.error(f"Не удалось вернуть refresh_interval индекса {index}: {e}")
+
+
+async def get_database_now(session: AsyncSession) -> datetime:
+    """Время БД на момент начала загрузки, с ним сравнивается create_date записей outbox."""
+    return await session.scalar(select(func.now()))
+
+
+async def requeue_changes_since(since: datetime) -> None:
+    """
+    Повторная постановка в outbox изменений, сделанных во время загрузки.
+    Загрузка могла записать документ по состоянию, прочитанному раньше этих изменений, поэтому обработчик outbox
+    отправляет их заново уже после её завершения.
+    """
+    latest = (
+        select(ElasticOutbox.organization_id, ElasticOutbox.operation)
+        .where(ElasticOutbox.create_date >= since)
+        .distinct(ElasticOutbox.organization_id)
+        .order_by(ElasticOutbox.organization_id, ElasticOutbox.id.desc())
+    )
+    async with AsyncSessionLocal() as session:
+        await session.execute(
+            insert(ElasticOutbox).from_select(["organization_id", "operation"], latest)
+        )
+        await session.commit()
+    logger.debug(f"Изменения организаций с {since} повторно поставлены в очередь outbox.")
+
+
+async def load_index(
+    index: str,
+    chunk_size: int,
+    concurrency: int,
+    organization_ids: Optional[list[int]] = None,
+) -> int:
+    """
+    Загрузка организаций из БД в индекс через bulk API.
+    Строки читаются серверным курсором и раздаются пачками concurrency параллельным отправителям.
+    """
+    queue: asyncio.Queue[Optional[list[dict]]] = asyncio.Queue(maxsize=concurrency * 2)
+    failed_total = 0
+
+    async def produce():
+        query = organization_directory_query().order_by(Organization.id)
+        if organization_ids is not None:
+            query = query.where(Organization.id.in_(organization_ids))
+        try:
+            async with AsyncSessionLocal() as session:
+                result = await session.stream(query.execution_options(yield_per=chunk_size))
+                async for partition in result.mappings().partitions():
+                    await queue.put(
+                        [
+                            {
+                                "_op_type": "index",
+                                "_index": index,
+                                "_id": row["id"],
+                                "_source": elastic_manager.build_organization_document(row),
+                            }
+                            for row in partition
+                        ]
+                    )
+        finally:
+            for _ in range(concurrency):
+                await queue.put(None)
+
+    async def consume():
+        nonlocal failed_total
+        while (actions := await queue.get()) is not None:
+            try:
+                failed = await elastic_manager.bulk(actions, chunk_size=chunk_size)
+            except Exception as e:
+                failed = {str(action["_id"]): {"error": str(e)} for action in actions}
+            failed_total += len(failed)
+            for document_id, error in failed.items():
+                logger.error(f"Организация {document_id} не загружена в индекс {index}: {error.get('error')}")
+
+    await asyncio.gather(produce(), *(consume() for _ in range(concurrency)))
+    return failed_total
+
+
+async def reindex_organizations(
+    chunk_size: int = settings.es_reindex_chunk_size,
+    concurrency: int = settings.es_reindex_concurrency,
+) -> int:
+    """Полная перезаливка организаций в текущий индекс с отключённым на время загрузки refresh_interval."""
+    async with reindex_lock():
+        index = elastic_manager.index_name
+        async with AsyncSessionLocal() as session:
+            started_at = await get_database_now(session)
+
+        refresh_interval = await elastic_manager.get_refresh_interval(index)
+        await elastic_manager.set_refresh_interval(index, "-1")
+        try:
+            failed = await load_index(index, chunk_size=chunk_size, concurrency=concurrency)
+        except Exception:
+            await restore_refresh_interval(index, refresh_interval)
+            raise
+        await elastic_manager.set_refresh_interval(index, refresh_interval)
+        await elastic_manager.es.indices.refresh(index=index)
+
+        await requeue_changes_since(
+            started_at - timedelta(seconds=settings.es_reindex_catchup_margin_seconds)
+        )
+    logger.info(f"Переиндексация организаций в {index} завершена, ошибок: {failed}.")
+    return failed
+
+
+async def catch_up_index(
+    index: str, since: datetime, chunk_size: int, concurrency: int
+) -> int:
+    """Дозагрузка в индекс организаций, изменённых или удалённых после since."""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(ElasticOutbox.organization_id)
+            .where(ElasticOutbox.create_date >= since)
+            .distinct()
+        )
+        changed_ids = result.scalars().all()
+        if not changed_ids:
+            return 0
+        result = await session.execute(
+            select(Organization.id).where(Organization.id.in_(changed_ids))
+        )
+        existing_ids = result.scalars().all()
+
+    failed = 0
+    if existing_ids:
+        failed += await load_index(
+            index,
+            chunk_size=chunk_size,
+            concurrency=concurrency,
+            organization_ids=existing_ids,
+        )
+    deleted_ids = set(changed_ids) - set(existing_ids)
+    if deleted_ids:
+        errors = await elastic_manager.bulk(
+            [
+                {
+                    "_op_type": "delete",
+                    "_index": index,
+                    "_id": organization_id,
+                }
+                for organization_id in deleted_ids
+            ]
+        )
+        failed += len(errors)
+    logger.debug(f"В индекс {index} дозагружено изменений организаций: {len(changed_ids)}.")
+    return failed
+
+
+async def blue_green_reindex(
+    chunk_size: int = settings.es_reindex_chunk_size,
+    concurrency: int = settings.es_reindex_concurrency,
+    delete_old_indices: bool = True,
+) -> int:
+    """
+    Переиндексация без простоя: организации загружаются в новый версионированный индекс, пока поиск
+    обслуживает старый, затем дозагружаются изменения, сделанные во время сборки, и псевдоним атомарно
+    переключается на новый индекс.
+    """
+    async with reindex_lock():
+        async with AsyncSessionLocal() as session:
+            started_at = await get_database_now(session)
+        since = started_at - timedelta(seconds=settings.es_reindex_catchup_margin_seconds)
+
+        new_index = await elastic_manager.create_versioned_index()
+        await elastic_manager.set_refresh_interval(new_index, "-1")
+        try:
+            failed = await load_index(new_index, chunk_size=chunk_size, concurrency=concurrency)
+            failed += await catch_up_index(new_index, since=since, chunk_size=chunk_size, concurrency=concurrency)
+        except Exception:
+            try:
+                await elastic_manager.es.indices.delete(index=new_index)
+                logger.error(f"Сборка индекса {new_index} прервана, индекс удалён.")
+            except Exception as e:
+                logger.error(f"Сборка индекса {new_index} прервана, индекс не удалён: {e}")
+            raise
+        await elastic_manager.set_refresh_interval(new_index, None)
+        await elastic_manager.es.indices.refresh(index=new_index)
+
+        old_indices = await elastic_manager.swap_alias(new_index)
+        # Изменения, попавшие в старый индекс после дозагрузки, обработчик outbox повторит уже через псевдоним.
+        await requeue_changes_since(since)
+        if delete_old_indices:
+            for index in old_indices:
+                await elastic_manager.es.indices.delete(index=index)
+                logger.debug(f"Старый индекс {index} удалён.")
+    logger.info(f"Переиндексация организаций в {new_index} завершена, ошибок: {failed}.")
+    return failed
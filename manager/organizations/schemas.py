@@ -3,10 +3,10 @@ from decimal import Decimal
 from typing import Optional
 
 from geoalchemy2 import WKBElement
-from geoalchemy2.shape import to_shape
-from pydantic import BaseModel, ConfigDict, field_validator
+from pydantic import BaseModel, ConfigDict, field_validator, ValidationInfo
 
 from activities.schemas import ActivityDB
+from buildings.validators import geo_point_wkt
 from organizations.validators import check_phones
 
 
@@ -47,9 +47,8 @@ class NonCircularBuildingDB(BaseModel):
     update_date: datetime
 
     @field_validator("geo_point", mode="before")
-    def validate_geo_point(cls, geo_point: WKBElement) -> str:
-        shaped_wkb_element = to_shape(geo_point)
-        return shaped_wkb_element.wkt
+    def validate_geo_point(cls, geo_point: WKBElement, info: ValidationInfo) -> str:
+        return geo_point_wkt(geo_point, info.data.get("latitude"), info.data.get("longitude"))
 
 
 # class ActivityDB(BaseModel):
@@ -75,3 +74,23 @@ class OrganizationShortDB(OrganizationBase):
     id: int
     create_date: datetime
     update_date: datetime
+
+
+class OrganizationSearchDB(OrganizationShortDB):
+    """Организация из документа Elastic Search с денормализованными данными здания и видов деятельности."""
+    address: Optional[str] = None
+    latitude: Optional[Decimal] = None
+    longitude: Optional[Decimal] = None
+    activity_ids: list[int] = []
+    activity_names: list[str] = []
+
+
+class OrganizationGeoSearchDB(OrganizationSearchDB):
+    distance_m: Optional[float] = None
+
+
+class OrganizationNearbyDB(OrganizationShortDB):
+    address: str
+    latitude: Decimal
+    longitude: Decimal
+    distance_m: float
@@ -0,0 +1,50 @@
+import argparse
+import asyncio
+import sys
+
+from core.config import settings
+from organizations.elastic_manager import elastic_manager
+from organizations.reindex import ReindexInProgressError, blue_green_reindex, reindex_organizations
+
+
+async def main(chunk_size: int, concurrency: int, in_place: bool, keep_old_indices: bool):
+    try:
+        if in_place:
+            failed = await reindex_organizations(chunk_size=chunk_size, concurrency=concurrency)
+        else:
+            failed = await blue_green_reindex(
+                chunk_size=chunk_size,
+                concurrency=concurrency,
+                delete_old_indices=not keep_old_indices,
+            )
+        print(f"Reindex finished, failed documents: {failed}.")
+    except ReindexInProgressError as e:
+        print(e)
+        sys.exit(1)
+    finally:
+        await elastic_manager.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Перезаливка организаций в индекс Elastic Search.")
+    parser.add_argument("--chunk-size", type=int, default=settings.es_reindex_chunk_size)
+    parser.add_argument("--concurrency", type=int, default=settings.es_reindex_concurrency)
+    parser.add_argument(
+        "--in-place",
+        action="store_true",
+        help="Перезаливка в текущий индекс вместо сборки нового индекса и переключения псевдонима",
+    )
+    parser.add_argument(
+        "--keep-old-indices",
+        action="store_true",
+        help="Не удалять индексы, с которых снят псевдоним",
+    )
+    args = parser.parse_args()
+    asyncio.run(
+        main(
+            chunk_size=args.chunk_size,
+            concurrency=args.concurrency,
+            in_place=args.in_place,
+            keep_old_indices=args.keep_old_indices,
+        )
+    )
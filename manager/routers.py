@@ -3,8 +3,12 @@ from fastapi import APIRouter
 from activities.endpoints import router as activity_router
 from buildings.endpoints import router as building_router
 from organizations.endpoints import router as organization_router
+from monitoring.endpoints import router as monitoring_router
+from tiles.endpoints import router as tile_router
 
 main_router = APIRouter(prefix="/api")
 main_router.include_router(building_router)
 main_router.include_router(activity_router)
 main_router.include_router(organization_router)
+main_router.include_router(tile_router)
+main_router.include_router(monitoring_router)
@@ -4,28 +4,37 @@ import os
 from dotenv import load_dotenv, find_dotenv
 from elasticsearch import AsyncElasticsearch
 
+from organizations.es_index import ORGANIZATION_INDEX_BODY, versioned_index_name
+
 load_dotenv(find_dotenv())
 
 async def create_index():
     es = AsyncElasticsearch(os.getenv("ES_ADDRESS", "http://elasticsearch:9200"))
-    index_name = "organizations"
+    alias = os.getenv("ES_INDEX_ALIAS", "organizations")
 
-    index_exists = await es.indices.exists(index=index_name)
-    if index_exists:
-        print(f"Index '{index_name}' already exists.")
+    if await es.indices.exists_alias(name=alias):
+        print(f"Alias '{alias}' already exists.")
+    elif await es.indices.exists(index=alias):
+        # Индекс из предыдущих версий создан под именем псевдонима, переносим его в версионированный индекс.
+        index_name = versioned_index_name(alias)
+        await es.indices.create(index=index_name, **ORGANIZATION_INDEX_BODY)
+        await es.reindex(
+            source={"index": alias},
+            dest={"index": index_name},
+            wait_for_completion=True,
+            refresh=True,
+        )
+        await es.indices.delete(index=alias)
+        await es.indices.put_alias(index=index_name, name=alias, is_write_index=True)
+        print(f"Legacy index '{alias}' moved to '{index_name}' behind alias '{alias}'.")
     else:
+        index_name = versioned_index_name(alias)
         response = await es.indices.create(
             index=index_name,
-            body={
-                "mappings": {
-                    "properties": {
-                        "id": {"type": "integer"},
-                        "name": {"type": "text"}
-                    }
-                }
-            }
+            aliases={alias: {"is_write_index": True}},
+            **ORGANIZATION_INDEX_BODY,
         )
-        print(f"Index '{index_name}' created. Response: {response}")
+        print(f"Index '{index_name}' with alias '{alias}' created. Response: {response}")
 
     await es.close()
 
@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from core.models import ElasticOutbox
+from organizations.elastic_manager import elastic_manager
+from organizations.outbox import OUTBOX_DELETE, OUTBOX_INDEX, elastic_outbox_worker
+
+
+def test_build_actions_send_documents_without_external_version():
+    entries = [
+        ElasticOutbox(id=11, organization_id=1, operation=OUTBOX_INDEX),
+        ElasticOutbox(id=10, organization_id=2, operation=OUTBOX_INDEX),
+        ElasticOutbox(id=12, organization_id=3, operation=OUTBOX_DELETE),
+    ]
+    organization = {
+        "id": 1,
+        "name": "Организация",
+        "phones": None,
+        "building_id": None,
+        "address": None,
+        "latitude": None,
+        "longitude": None,
+        "activity_ids": None,
+        "activity_names": None,
+        "activity_tree_ids": None,
+        "create_date": datetime(2026, 1, 1),
+        "update_date": datetime(2026, 1, 1),
+    }
+
+    actions = elastic_outbox_worker.build_actions(entries, {1: organization})
+
+    # Организации 2 уже нет в БД, её документ удалит следующая запись с операцией delete.
+    assert [(action["_op_type"], action["_id"]) for action in actions] == [(OUTBOX_INDEX, 1), (OUTBOX_DELETE, 3)]
+    assert all("version" not in action and "version_type" not in action for action in actions)
+    assert actions[0]["_source"] == elastic_manager.build_organization_document(organization)
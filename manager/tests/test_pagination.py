@@ -0,0 +1,40 @@
+import pytest
+from fastapi import HTTPException
+
+from buildings.crud import RADIUS_CURSOR_DB, BuildingCRUD
+from core.pagination import decode_cursor, encode_cursor, is_cursor_integer, is_cursor_number
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(12.5, 7, RADIUS_CURSOR_DB), size=3) == [12.5, 7, RADIUS_CURSOR_DB]
+
+
+@pytest.mark.parametrize("value", [True, False, 1.5, "1", None])
+def test_cursor_integer_rejects_non_integers(value):
+    assert not is_cursor_integer(value)
+
+
+@pytest.mark.parametrize("value", [True, float("nan"), float("inf"), "1.5", None])
+def test_cursor_number_rejects_non_numbers(value):
+    assert not is_cursor_number(value)
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        encode_cursor(True, 1),
+        encode_cursor(1.5, False),
+        "не курсор",
+        encode_cursor(1.5),
+    ],
+)
+def test_distance_cursor_rejects_malformed_values(cursor):
+    with pytest.raises(HTTPException) as error:
+        BuildingCRUD.decode_distance_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_radius_cursor_rejects_bool_id():
+    with pytest.raises(HTTPException) as error:
+        BuildingCRUD.decode_radius_cursor(encode_cursor(1.5, True, RADIUS_CURSOR_DB))
+    assert error.value.status_code == 400
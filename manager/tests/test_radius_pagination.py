@@ -0,0 +1,91 @@
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from buildings.crud import RADIUS_CURSOR_CACHE, RADIUS_CURSOR_DB, BuildingCRUD, building_crud
+from core.config import settings
+from core.pagination import encode_cursor
+
+# Расстояния кэша (локальный эллипсоид) чуть отличаются от ST_Distance, порядок зданий при этом тот же.
+CACHED = [(100.0, 1, {"id": 1}), (150.0, 4, {"id": 4}), (150.0, 7, {"id": 7}), (230.0, 2, {"id": 2})]
+POSTGIS_DISTANCES = {1: 100.02, 4: 150.03, 7: 150.03, 2: 230.05}
+
+
+def ids(page: dict) -> list[int]:
+    return [item["id"] for item in page["items"]]
+
+
+def test_cached_pages_cover_all_buildings_once():
+    first = BuildingCRUD.paginate_cached_radius(CACHED, 2, None)
+    after_key = BuildingCRUD.decode_radius_cursor(first["next_cursor"])
+    second = BuildingCRUD.paginate_cached_radius(CACHED, 2, after_key)
+
+    assert after_key == (150.0, 4, RADIUS_CURSOR_CACHE)
+    assert ids(first) + ids(second) == [1, 4, 7, 2]
+    assert second["next_cursor"] is None
+
+
+def test_cache_continues_after_database_cursor():
+    # Расстояние из курсора БД больше расстояния кэша у здания 7, без поиска по id здание 7 повторилось бы.
+    cursor = encode_cursor(POSTGIS_DISTANCES[4], 4, RADIUS_CURSOR_DB)
+    page = BuildingCRUD.paginate_cached_radius(CACHED, 2, BuildingCRUD.decode_radius_cursor(cursor))
+
+    assert ids(page) == [7, 2]
+
+
+def test_cache_falls_back_to_cursor_distance_for_unknown_building():
+    cursor = encode_cursor(POSTGIS_DISTANCES[4], 99, RADIUS_CURSOR_DB)
+    page = BuildingCRUD.paginate_cached_radius(CACHED, 10, BuildingCRUD.decode_radius_cursor(cursor))
+
+    assert ids(page) == [2]
+
+
+def test_radius_cursor_rejects_unknown_source():
+    with pytest.raises(HTTPException) as error:
+        BuildingCRUD.decode_radius_cursor(encode_cursor(1.5, 1, "replica"))
+    assert error.value.status_code == 400
+
+
+class RecordingSession:
+    """Сессия, которая запоминает запрос и возвращает пустой результат."""
+
+    def __init__(self):
+        self.queries = []
+
+    async def execute(self, query):
+        self.queries.append(query)
+        return self
+
+    def all(self):
+        return []
+
+
+async def database_radius_sql(after: str) -> str:
+    session = RecordingSession()
+    await building_crud.get_buildings_in_radius(
+        Decimal("55.75"),
+        Decimal("37.6"),
+        settings.radius_cache_max_radius_km + 1,
+        session,
+        limit=2,
+        after=after,
+    )
+    (query,) = session.queries
+    return str(query.compile(dialect=postgresql.dialect()))
+
+
+@pytest.mark.asyncio
+async def test_database_reseeks_boundary_of_cache_cursor():
+    sql = await database_radius_sql(encode_cursor(150.0, 4, RADIUS_CURSOR_CACHE))
+
+    assert "coalesce((SELECT ST_Distance(buildings_1.geo_point" in sql
+    assert "WHERE buildings_1.id = " in sql
+
+
+@pytest.mark.asyncio
+async def test_database_uses_its_own_cursor_distance():
+    sql = await database_radius_sql(encode_cursor(POSTGIS_DISTANCES[4], 4, RADIUS_CURSOR_DB))
+
+    assert "coalesce" not in sql
@@ -0,0 +1,25 @@
+import pytest
+
+from tiles.crud import tile_bounds
+
+MAX_MERCATOR_LATITUDE = 85.0511287798
+
+
+def test_world_tile_bounds():
+    min_latitude, min_longitude, max_latitude, max_longitude = tile_bounds(0, 0, 0, margin=0.1)
+    assert (min_longitude, max_longitude) == (-180.0, 180.0)
+    assert min_latitude == pytest.approx(-MAX_MERCATOR_LATITUDE)
+    assert max_latitude == pytest.approx(MAX_MERCATOR_LATITUDE)
+
+
+@pytest.mark.parametrize(
+    "x, y, expected",
+    [
+        (0, 0, (0.0, -180.0, MAX_MERCATOR_LATITUDE, 0.0)),
+        (1, 0, (0.0, 0.0, MAX_MERCATOR_LATITUDE, 180.0)),
+        (0, 1, (-MAX_MERCATOR_LATITUDE, -180.0, 0.0, 0.0)),
+        (1, 1, (-MAX_MERCATOR_LATITUDE, 0.0, 0.0, 180.0)),
+    ],
+)
+def test_first_zoom_tile_bounds(x, y, expected):
+    assert tile_bounds(1, x, y) == pytest.approx(expected, abs=1e-9)
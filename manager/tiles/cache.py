@@ -0,0 +1,50 @@
+import hashlib
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from core.config import settings
+
+
+class TileCache:
+    """
+    LRU кэш векторных тайлов внутри процесса.
+    Ключ тайла включает версию из core.cache_versions: после коммита записи в здания или организации каждый процесс
+    получает уведомление и очищает свой кэш при первом чтении новой версии. Вместе с тайлом хранится ETag,
+    посчитанный по его содержимому, поэтому он совпадает во всех процессах приложения.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.version = 0
+        self._tiles: OrderedDict[tuple[int, int, int, int], tuple[bytes, str]] = OrderedDict()
+
+    @staticmethod
+    def etag_for(tile: bytes) -> str:
+        return f'"tiles-{hashlib.sha1(tile).hexdigest()}"'
+
+    async def get_tile(
+        self, version: Optional[int], z: int, x: int, y: int, loader: Callable[[], Awaitable[bytes]]
+    ) -> tuple[bytes, str]:
+        """Тайл и его ETag. Без версии (уведомления не принимаются) тайл читается из БД и не сохраняется."""
+        if version is None:
+            tile = await loader()
+            return tile, self.etag_for(tile)
+        if version > self.version:
+            self.version = version
+            self._tiles.clear()
+        key = (z, x, y, version)
+        cached = self._tiles.get(key)
+        if cached is not None:
+            self._tiles.move_to_end(key)
+            return cached
+        tile = await loader()
+        cached = tile, self.etag_for(tile)
+        # Тайл запроса, прочитавшего версию раньше уведомления о записи, не сохраняется рядом с более новыми.
+        if version == self.version:
+            self._tiles[key] = cached
+            if len(self._tiles) > self.max_size:
+                self._tiles.popitem(last=False)
+        return cached
+
+
+tile_cache = TileCache(max_size=settings.tile_cache_size)
@@ -0,0 +1,78 @@
+import math
+
+from geoalchemy2 import Geometry
+from sqlalchemy import cast, func, literal_column, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from buildings.crud import building_crud
+from core.config import settings
+from core.models import Building, Organization, organization_activity
+
+WEB_MERCATOR_SRID = 3857
+BUILDINGS_LAYER = "buildings"
+
+
+def tile_bounds(z: int, x: int, y: int, margin: float = 0.0) -> tuple[float, float, float, float]:
+    """Границы тайла XYZ в градусах (min_lat, min_lon, max_lat, max_lon) с запасом margin в долях тайла."""
+    tiles_count = 2 ** z
+
+    def longitude(tile_x: float) -> float:
+        return tile_x / tiles_count * 360.0 - 180.0
+
+    def latitude(tile_y: float) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y / tiles_count))))
+
+    min_longitude = max(longitude(x - margin), -180.0)
+    max_longitude = min(longitude(x + 1 + margin), 180.0)
+    min_latitude = latitude(min(y + 1 + margin, tiles_count))
+    max_latitude = latitude(max(y - margin, 0))
+    return min_latitude, min_longitude, max_latitude, max_longitude
+
+
+async def get_buildings_tile(z: int, x: int, y: int, session: AsyncSession) -> bytes:
+    """
+    Векторный тайл (MVT) слоя зданий, собранный в PostGIS через ST_AsMVTGeom/ST_AsMVT.
+    У каждого здания в свойствах адрес, количество организаций и id их видов деятельности через запятую.
+    """
+    envelope = func.ST_TileEnvelope(z, x, y)
+    geometry = func.ST_AsMVTGeom(
+        func.ST_Transform(cast(Building.geo_point, Geometry(srid=settings.wsg_standard)), WEB_MERCATOR_SRID),
+        envelope,
+        settings.tile_extent,
+        settings.tile_buffer,
+        True,
+    )
+    organizations = (
+        select(
+            func.count(Organization.id.distinct()).label("organizations_count"),
+            func.array_to_string(
+                func.array_agg(organization_activity.c.activity_id.distinct()), ","
+            ).label("activity_ids"),
+        )
+        .select_from(Organization)
+        .outerjoin(organization_activity, organization_activity.c.organization_id == Organization.id)
+        .where(Organization.building_id == Building.id)
+        .lateral("building_organizations")
+    )
+    tile = (
+        select(
+            Building.id,
+            Building.address,
+            organizations.c.organizations_count,
+            organizations.c.activity_ids,
+            geometry.label("geom"),
+        )
+        .join(organizations, true())
+        .where(
+            building_crud.bbox_filter(
+                *tile_bounds(z, x, y, margin=settings.tile_buffer / settings.tile_extent)
+            )
+        )
+        .subquery("tile")
+    )
+    result = await session.execute(
+        select(
+            func.ST_AsMVT(literal_column("tile"), BUILDINGS_LAYER, settings.tile_extent, "geom")
+        ).select_from(tile)
+    )
+    return bytes(result.scalar() or b"")
@@ -0,0 +1,49 @@
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from fastapi.params import Depends, Path
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.authentication_utils import check_token
+from core.cache_versions import TILES_CACHE, cache_versions
+from core.config import settings
+from core.db import get_async_session
+from core.utils import Tags, etag_matches
+from tiles.cache import tile_cache
+from tiles.crud import get_buildings_tile
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+
+router = APIRouter(
+    prefix="/tiles",
+    tags=[Tags.tiles],
+    dependencies=[Depends(check_token)],
+)
+
+
+@router.get("/{z}/{x}/{y}.mvt")
+async def get_tile(
+        request: Request,
+        z: int = Path(..., ge=0, le=settings.tile_max_zoom),
+        x: int = Path(..., ge=0),
+        y: int = Path(..., ge=0),
+        session: AsyncSession = Depends(get_async_session),
+):
+    if x >= 2 ** z or y >= 2 ** z:
+        raise HTTPException(
+            detail="Координаты тайла выходят за пределы сетки для данного масштаба.",
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+    try:
+        tile, etag = await tile_cache.get_tile(
+            cache_versions.version(TILES_CACHE), z, x, y, lambda: get_buildings_tile(z, x, y, session=session)
+        )
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                headers={"ETag": etag},
+            )
+    except Exception as e:
+        raise HTTPException(
+            detail=f"{e}",
+            status_code=500,
+        )
+    return Response(content=tile, media_type=MVT_MEDIA_TYPE, headers={"ETag": etag})